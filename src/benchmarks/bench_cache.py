@@ -0,0 +1,65 @@
+"""
+Compares the cost of a get from ObjectCache and MappedObjectCache, on a
+model of about 100k objects (the size of a large WSDL's definitions) and
+on a small one, and checks that both return the same object.
+
+usage: python benchmarks/bench_cache.py [iterations] [objects]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suds.cache import ObjectCache, MappedObjectCache
+
+class Node(object):
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.children = []
+        self.attributes = {'type': 's:string', 'minOccurs': '0'}
+
+def model(count):
+    root = Node('root')
+    parent = root
+    for i in range(count / 2):
+        if not i % 50:
+            parent = Node('complexType%d' % i, root)
+            root.children.append(parent)
+        parent.children.append(Node(u'element%d' % i, parent))
+    return root
+
+def flatten(node):
+    return [(node.name, node.attributes)] + [x for c in node.children for x in flatten(c)]
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    location = tempfile.mkdtemp()
+    failed = 0
+    try:
+        for name, n in (('large', count), ('small', 100)):
+            object = model(n)
+            expected = flatten(object)
+            times = []
+            for cls in (ObjectCache, MappedObjectCache):
+                cache = cls(location=os.path.join(location, cls.__name__))
+                cache.put(name, object)
+                cache.get(name)
+                if flatten(cache.get(name)) != expected:
+                    print '%-6s %s DIFFERENT' % (name, cls.__name__)
+                    failed += 1
+                number = max(iterations * 1000 / n, 1) if n < 1000 else iterations
+                times.append(min(timeit.repeat(lambda: cache.get(name), number=number, repeat=3)) / number)
+            print '%-6s %7d objects  ObjectCache %9.1f ms  MappedObjectCache %9.1f ms  (%.2fx)' % (
+                name, n, times[0] * 1e3, times[1] * 1e3, times[0] / times[1])
+    finally:
+        shutil.rmtree(location, True)
+    return failed and 1 or 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Compares Client._parse (single pass expat) with the previous minidom based
+implementation on GetMailingDetails style replies.
+
+usage: python benchmarks/bench_parse.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+from xml.dom.minidom import parseString
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docmail import client
+
+FIELDS = [
+    ('Mailing GUID', '1b2c3d4e-5f60-7182-93a4-b5c6d7e8f901'),
+    ('Order Ref', '123456'),
+    ('MailingName', 'Spring newsletter'),
+    ('MailingDescription', 'Quarterly customer newsletter & offers'),
+    ('Mailing status', 'Mailing submitted'),
+    ('ProductType', 'A4Letter'),
+    ('DeliveryType', 'Standard'),
+    ('IsColour', 'Yes'),
+    ('IsDuplex', 'No'),
+    ('CourierDeliveryToSelf', 'No'),
+    ('DespatchDate', '14/03/2011 09:30:00'),
+    ('AddressNamePrefix', 'Dear'),
+    ('AddressNameFormat', 'Full Name'),
+    ('DiscountCode', ''),
+    ('MinEnvelopeSize', 'C5'),
+    ('MailingListGUID', '00000000-0000-0000-0000-000000000000'),
+    ('Number of addresses', '2500'),
+    ('Number of pages', '2'),
+    ('Total price ex VAT', '1234.56'),
+    ('Total VAT', '246.91'),
+    ('Total price inc VAT', '1481.47'),
+    ('Date created', '10/03/2011 16:45:12'),
+    ('Date processed', '11/03/2011 08:01:59'),
+    ('Date approved', '11/03/2011 08:15:03'),
+    ('PO reference', 'PO-77812'),
+    ('Payment method', 'Topup'),
+    ('Partial process', 'Yes'),
+    ('Email success list', 'ops@example.com'),
+    ('Email error list', 'ops@example.com'),
+    ('Http post on success', 'https://example.com/docmail/success'),
+    ('Http post on error', 'https://example.com/docmail/error'),
+]
+
+def reply(fields):
+    records = ''.join('<Result><Key>%s</Key><Value>%s</Value></Result>' % (escape(k), escape(v))
+                      for k, v in fields)
+    return u'<Results>%s</Results>' % records
+
+def parse_minidom(self, xml, return_class=client.DocmailObject):
+    """ the previous implementation of Client._parse """
+    ob = return_class()
+    dom = parseString(xml)
+    for node in dom.firstChild.childNodes:
+        if node.childNodes[1].firstChild is None:
+            # minidom has no text node for empty values
+            continue
+        key = node.childNodes[0].firstChild.wholeText
+        value = node.childNodes[1].firstChild.wholeText
+        key = self._format_key(key)
+        value = self._format_value(value)
+        setattr(ob, key, value)
+    if hasattr(ob, '_format_data'):
+        ob._format_data()
+    return ob
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    c = client.Client.__new__(client.Client)
+    xml = reply(FIELDS)
+
+    fast = c._parse(xml, client.Mailing)
+    slow = parse_minidom(c, xml, client.Mailing)
+    for k, v in FIELDS:
+        if v:
+            k = c._format_key(k)
+            assert getattr(fast, k) == getattr(slow, k), k
+
+    for name, fn in (('minidom', lambda: parse_minidom(c, xml, client.Mailing)),
+                     ('expat', lambda: c._parse(xml, client.Mailing))):
+        best = min(timeit.repeat(fn, number=iterations, repeat=3))
+        print '%-8s %8.1f us/reply' % (name, best / iterations * 1e6)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Checks that the expat parser backend (suds.sax.parser.ExpatHandler) builds
+the same document as the xml.sax backend, and compares their speed, on the
+docmail WSDL and on SOAP reply fixtures.
+
+usage: python benchmarks/bench_sax.py [iterations] [wsdl path or url ..]
+
+with no WSDL given, the bundled copies (see update_wsdl.py) are used
+"""
+
+import os
+import sys
+import timeit
+import urllib2
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docmail import client
+from suds.sax.parser import Parser
+
+NS = 'https://www.cfhdocmail.com/LiveAPI2/'
+
+ENVELOPE = ('<?xml version="1.0" encoding="utf-8"?>'
+            '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xmlns:xsd="http://www.w3.org/2001/XMLSchema">\n'
+            '  <soap:Body>\n    %s\n  </soap:Body>\n</soap:Envelope>')
+
+def result_reply(op, result):
+    return ENVELOPE % ('<%sResponse xmlns="%s"><%sResult>%s</%sResult></%sResponse>'
+                       % (op, NS, op, escape(result), op, op))
+
+def details(n):
+    records = ''.join('<Result><Key>Field %d</Key><Value>value &amp; %d</Value></Result>' % (i, i)
+                      for i in range(n))
+    return '<Results>%s</Results>' % records
+
+FAULT = ENVELOPE % (
+    '<soap:Fault><faultcode>soap:Server</faultcode>'
+    '<faultstring>Server was unable to process request. ---&gt; Error code:99 '
+    '\xc2\xa3 &#169;</faultstring><detail xmlns="" /></soap:Fault>')
+
+MIXED = ('<?xml version="1.0" encoding="utf-8"?>'
+         '<a:root xmlns:a="urn:a" xmlns="urn:default" xsi:nil="false" '
+         'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">\n'
+         '  leading <b x="1" a:y="&lt;2&gt;" z="&#x41;">text<![CDATA[ <cdata> ]]>more</b>\n'
+         '  <c xmlns="">  padded  </c><a:d/> trailing \n</a:root>')
+
+REPLIES = [
+    ('GetStatus', result_reply('GetStatus', 'Mailing submitted')),
+    ('GetMailingDetails', result_reply('GetMailingDetails', details(40))),
+    ('large listing', result_reply('GetMailingDetails', details(5000))),
+    ('fault', FAULT),
+    ('mixed', MIXED),
+]
+
+def same(a, b, path=''):
+    """ returns None when the trees are the same, else where they differ """
+    path = '%s/%s' % (path, a.qname())
+    if (a.prefix, a.name, a.expns) != (b.prefix, b.name, b.expns):
+        return '%s: name %r != %r' % (path, (a.prefix, a.name, a.expns), (b.prefix, b.name, b.expns))
+    if a.nsprefixes != b.nsprefixes:
+        return '%s: nsprefixes %r != %r' % (path, a.nsprefixes, b.nsprefixes)
+    # xml.sax reports attributes in dict order, expat in document order
+    attributes = lambda n: sorted((x.prefix, x.name, x.value, type(x.value)) for x in n.attributes)
+    if attributes(a) != attributes(b):
+        return '%s: attributes %r != %r' % (path, attributes(a), attributes(b))
+    for node in (a, b):
+        for x in node.attributes:
+            if x.parent is not node:
+                return '%s: attribute %s parent' % (path, x.qname())
+    if (a.text, type(a.text)) != (b.text, type(b.text)):
+        return '%s: text %r != %r' % (path, a.text, b.text)
+    if len(a.children) != len(b.children):
+        return '%s: %d children != %d' % (path, len(a.children), len(b.children))
+    for x, y in zip(a.children, b.children):
+        if x.parent is not a or y.parent is not b:
+            return '%s: parent' % path
+        difference = same(x, y, path)
+        if difference is not None:
+            return difference
+    return None
+
+def fixtures(args):
+    if args:
+        for location in args:
+            if os.path.exists(location):
+                yield location, open(location, 'rb').read()
+            else:
+                yield location, urllib2.urlopen(location).read()
+    else:
+        names = [name for name in sorted(os.listdir(client.WSDL_DIR)) if name.endswith('.wsdl')]
+        if not names:
+            print 'no bundled WSDLs (see update_wsdl.py) - give a WSDL path or url to include one'
+        for name in names:
+            yield name, open(os.path.join(client.WSDL_DIR, name), 'rb').read()
+    for fixture in REPLIES:
+        yield fixture
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    failed = 0
+    for name, xml in fixtures(sys.argv[2:]):
+        sax = Parser('sax').parse(string=xml)
+        fast = Parser('expat').parse(string=xml)
+        difference = same(sax.root(), fast.root())
+        if difference is not None:
+            print '%-20s DIFFERENT %s' % (name, difference)
+            failed += 1
+            continue
+        number = max(iterations * 10000 / len(xml), 1)
+        times = {}
+        for backend in Parser.backends:
+            fn = lambda: Parser(backend).parse(string=xml)
+            times[backend] = min(timeit.repeat(fn, number=number, repeat=3)) / number
+        print '%-20s %8d bytes  sax %9.1f us  expat %9.1f us  (%.1fx)' % (
+            name, len(xml), times['sax'] * 1e6, times['expat'] * 1e6, times['sax'] / times['expat'])
+    return failed and 1 or 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Checks that a templated soap message is the same as the marshalled one, and
+compares the cost of building the request for each, on GetStatus (the call
+polled most often). requests are built with nosend, so no server is needed.
+
+usage: python benchmarks/bench_template.py [iterations] [wsdl path or url]
+
+with no WSDL given, the bundled test WSDL (see update_wsdl.py) is used if
+there is one, else a minimal GetStatus WSDL
+"""
+
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docmail import client
+from suds.cache import NoCache
+from suds.client import Client
+
+WSDL = '''<?xml version="1.0" encoding="utf-8"?>
+<wsdl:definitions xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+    xmlns:s="http://www.w3.org/2001/XMLSchema"
+    xmlns:tns="https://www.cfhdocmail.com/LiveAPI2/"
+    xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/"
+    targetNamespace="https://www.cfhdocmail.com/LiveAPI2/">
+  <wsdl:types>
+    <s:schema elementFormDefault="qualified" targetNamespace="https://www.cfhdocmail.com/LiveAPI2/">
+      <s:element name="GetStatus"><s:complexType><s:sequence>
+        <s:element minOccurs="0" maxOccurs="1" name="Username" type="s:string"/>
+        <s:element minOccurs="0" maxOccurs="1" name="Password" type="s:string"/>
+        <s:element minOccurs="0" maxOccurs="1" name="MailingGUID" type="s:string"/>
+        <s:element minOccurs="0" maxOccurs="1" name="ReturnFormat" type="s:string"/>
+      </s:sequence></s:complexType></s:element>
+      <s:element name="GetStatusResponse"><s:complexType><s:sequence>
+        <s:element minOccurs="0" maxOccurs="1" name="GetStatusResult" type="s:string"/>
+      </s:sequence></s:complexType></s:element>
+    </s:schema>
+  </wsdl:types>
+  <wsdl:message name="GetStatusSoapIn"><wsdl:part name="parameters" element="tns:GetStatus"/></wsdl:message>
+  <wsdl:message name="GetStatusSoapOut"><wsdl:part name="parameters" element="tns:GetStatusResponse"/></wsdl:message>
+  <wsdl:portType name="DMWSSoap">
+    <wsdl:operation name="GetStatus">
+      <wsdl:input message="tns:GetStatusSoapIn"/><wsdl:output message="tns:GetStatusSoapOut"/>
+    </wsdl:operation>
+  </wsdl:portType>
+  <wsdl:binding name="DMWSSoap" type="tns:DMWSSoap">
+    <soap:binding transport="http://schemas.xmlsoap.org/soap/http"/>
+    <wsdl:operation name="GetStatus">
+      <soap:operation soapAction="https://www.cfhdocmail.com/LiveAPI2/GetStatus" style="document"/>
+      <wsdl:input><soap:body use="literal"/></wsdl:input>
+      <wsdl:output><soap:body use="literal"/></wsdl:output>
+    </wsdl:operation>
+  </wsdl:binding>
+  <wsdl:service name="DMWS">
+    <wsdl:port name="DMWSSoap" binding="tns:DMWSSoap">
+      <soap:address location="https://www.cfhdocmail.com/TestAPI2/DMWS.asmx"/>
+    </wsdl:port>
+  </wsdl:service>
+</wsdl:definitions>
+'''
+
+ARGS = ('username', 'p&ssword <1>', '6f1d2a48-7a4c-4c1e-9a34-0b8e2f5d9c11', 'XML')
+
+def wsdl_url(args):
+    if args:
+        location = args[0]
+        if os.path.exists(location):
+            return 'file://' + os.path.abspath(location)
+        return location
+    path = os.path.join(client.WSDL_DIR, client.BUNDLED_WSDL.get(client.DOCMAIL_WSDL_TEST) or '')
+    if os.path.isfile(path):
+        return 'file://' + path
+    fd, path = tempfile.mkstemp(suffix='.wsdl')
+    os.write(fd, WSDL)
+    os.close(fd)
+    return 'file://' + path
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    url = wsdl_url(sys.argv[2:])
+    clients = {}
+    for templates in (False, True):
+        clients[templates] = Client(url, cache=NoCache(), nosend=True, templates=templates)
+    envelopes = [clients[t].service.GetStatus(*ARGS).envelope for t in (False, True)]
+    if envelopes[0] != envelopes[1]:
+        print 'DIFFERENT\n%s\n%s' % tuple(envelopes)
+        return 1
+    times = {}
+    for templates, c in clients.items():
+        fn = lambda: c.service.GetStatus(*ARGS)
+        times[templates] = min(timeit.repeat(fn, number=iterations, repeat=3)) / iterations
+    print 'GetStatus request  marshalled %7.1f us  template %7.1f us  (%.1fx)' % (
+        times[False] * 1e6, times[True] * 1e6, times[False] / times[True])
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+"""
+Submits a large campaign of mailings from a manifest, spreading the work over
+a pool of processes, eg:
+
+    DOCMAIL_USERNAME=... DOCMAIL_PASSWORD=... \
+        python bulk.py campaign.jsonl campaign.checkpoint --processes 8 --rate 20
+
+the manifest has one mailing per line (JSON). id must be unique, and is used
+to resume the campaign. everything else is optional:
+
+    {"id": "spring-0001",
+     "name": "spring campaign 0001",
+     "mailing": {"is_colour": false, "delivery_type": "First"},
+     "templates": ["letter.doc", {"path": "insert.doc", "template_name": "insert"}],
+     "mailing_list": {"path": "0001.csv"},
+     "submit": false, "partial_process": true,
+     "process": {"po_reference": "spring"}}
+
+- each worker process has its own client. the WSDL is loaded once, into an
+  on-disk cache shared by the workers, before the pool starts
+- the workers create, upload and process the mailings. a processed mailing is
+  handed back to the main process, where a single StatusPoller waits for the
+  status of every processed mailing at once (see --timeout), so a worker is
+  never held by a mailing waiting on docmail
+- the progress of each mailing (id, mailing guid, stage, stages completed,
+  status, error) is appended to the checkpoint file as each stage starts and
+  completes. re-running with the same checkpoint skips mailings that completed
+  and resumes interrupted ones after their last completed stage; failed
+  mailings are only resumed with --retry-failed
+- a mailing is never created twice once its guid is known, and never processed
+  twice: if process_mailing was interrupted, or failed other than by docmail
+  rejecting it, the mailing may have been processed and is left for you to
+  check (it is counted as failed and not run again)
+- --rate limits the docmail api calls per second made by all the workers and
+  the poller
+"""
+
+import json
+import logging
+import multiprocessing
+import optparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from docmail import client, poller
+from suds.cache import ObjectCache
+
+WSDL_URLS = { 'live': client.DOCMAIL_WSDL_LIVE,
+              'test': client.DOCMAIL_WSDL_TEST,
+              'beta': client.DOCMAIL_WSDL_BETA }
+
+log = logging.getLogger('docmail.bulk')
+
+class RateLimiter(object):
+    """ allows up to rate calls per second, in bursts of up to burst calls """
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.rate:
+            return
+        while True:
+            self.lock.acquire()
+            try:
+                now = time.time()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            finally:
+                self.lock.release()
+            time.sleep(delay)
+
+class RateLimitedClient(client.Client):
+    def __init__(self, username, password, source='', wsdl_url=None, limiter=None, **kwargs):
+        self.limiter = limiter
+        client.Client.__init__(self, username, password, source, wsdl_url, **kwargs)
+
+    def _call(self, operation, args, handler):
+        if self.limiter is not None:
+            self.limiter.wait()
+        return client.Client._call(self, operation, args, handler)
+
+def read_manifest(path):
+    """ generates the manifest entries. blank lines and lines starting with # are skipped """
+    fp = open(path)
+    try:
+        for n, line in enumerate(fp):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            entry = json.loads(line)
+            if not entry.get('id'):
+                raise ValueError('%s line %d: no id' % (path, n + 1))
+            yield entry
+    finally:
+        fp.close()
+
+def read_checkpoint(path):
+    """ returns the latest checkpoint record for each mailing id """
+    records = {}
+    if not os.path.exists(path):
+        return records
+    fp = open(path)
+    try:
+        for line in fp:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # a line cut short when the previous run was killed
+                continue
+            records[record['id']] = record
+    finally:
+        fp.close()
+    return records
+
+def make_job(entry):
+    mailing = client.Mailing(entry.get('name') or entry['id'])
+    for k, v in entry.get('mailing', {}).items():
+        setattr(mailing, k, v)
+    templates = []
+    for template in entry.get('templates', []):
+        if isinstance(template, basestring):
+            template = {'path': template}
+        template = dict(template)
+        template_file = client.TemplateFile(template.pop('path'))
+        for k, v in template.items():
+            setattr(template_file, k, v)
+        templates.append(template_file)
+    mailing_list = entry.get('mailing_list')
+    if mailing_list:
+        if isinstance(mailing_list, basestring):
+            mailing_list = {'path': mailing_list}
+        mailing_list = dict(mailing_list)
+        path = mailing_list.pop('path')
+        mailing_list = client.MailingListFile(path, **mailing_list)
+    return client.BatchJob(mailing, templates, mailing_list,
+                           entry.get('submit', False), entry.get('partial_process', True),
+                           **entry.get('process', {}))
+
+def unsafe(record):
+    """ returns whether process_mailing was interrupted or failed after it may have
+        reached docmail, so that resuming the record could process the mailing twice
+    """
+    if record['stage'] != 'process_mailing' or record.get('rejected'):
+        return False
+    return ( record.get('running') or record['error'] is not None )
+
+def write_record(fd, record):
+    # a single O_APPEND write, so records from the workers are not interleaved
+    os.write(fd, json.dumps(record) + '\n')
+
+# each worker process's client and checkpoint file, created by init_worker
+_client = None
+_checkpoint = None
+
+def open_checkpoint(settings):
+    return os.open(settings['checkpoint'], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0666)
+
+def make_client(settings):
+    """ a client limited to an equal share of the rate, between the workers and the poller """
+    limiter = None
+    if settings['rate']:
+        limiter = RateLimiter(settings['rate'] / (settings['processes'] + 1))
+    return RateLimitedClient(settings['username'], settings['password'], settings['source'],
+                             settings['wsdl_url'], limiter=limiter,
+                             cache=ObjectCache(location=settings['cache'], days=1),
+                             cachingpolicy=1)
+
+def init_worker(settings):
+    global _client, _checkpoint
+    _checkpoint = open_checkpoint(settings)
+    _client = make_client(settings)
+
+def make_record(entry, result, running=False):
+    record = { 'id': entry['id'],
+               'guid': getattr(result.mailing, 'guid', None),
+               'stage': result.stage,
+               'completed': result.completed,
+               'running': running,
+               'status': result.status,
+               'error': None,
+               'submit': result.job.submit,
+               'partial_process': result.job.partial_process }
+    if result.error is not None:
+        record['error'] = repr(result.error)
+        record['rejected'] = isinstance(result.error, client.DocmailException)
+    return record
+
+def run_entry(args):
+    """ runs one mailing in a worker up to stage 'processed', resuming after the
+        stages completed in its previous checkpoint record (if any). returns its
+        final checkpoint record
+    """
+    entry, previous = args
+    record = { 'id': entry['id'], 'guid': None, 'stage': 'load', 'completed': 0,
+               'running': False, 'status': None, 'error': None }
+    try:
+        job = make_job(entry)
+    except Exception, e:
+        record['error'] = repr(e)
+        return record
+    completed = 0
+    if previous is not None and previous.get('guid'):
+        job.mailing.guid = previous['guid']
+        completed = previous.get('completed', 0)
+        log.info('%s resuming %s after %d stages', entry['id'], previous['guid'], completed)
+    def progress(result, running):
+        write_record(_checkpoint, make_record(entry, result, running))
+    result = _client._run_batch_job(job, completed=completed, progress=progress, poll=False)
+    return make_record(entry, result)
+
+class Tracker(object):
+    """ polls the status of processed mailings with a single StatusPoller, appending
+        each mailing's final record to the checkpoint when its status is terminal
+    """
+    def __init__(self, client, fd, timeout):
+        self.poller = poller.StatusPoller(client)
+        self.fd = fd
+        self.timeout = timeout
+        self.failed = poller.matcher(poller.FAILED_STATUSES)
+        self.condition = threading.Condition()
+        self.pending = 0
+        self.succeeded = 0
+        self.errors = 0
+
+    def track(self, record):
+        self.condition.acquire()
+        try:
+            self.pending += 1
+        finally:
+            self.condition.release()
+        terminal = poller.terminal_statuses(record.get('submit', False),
+                                            record.get('partial_process', True))
+        future = self.poller.track(record['guid'], terminal=terminal, timeout=self.timeout)
+        future.add_done_callback(lambda future: self.polled(record, future))
+
+    def polled(self, record, future):
+        record = dict(record, stage='get_process_status', running=False, error=None)
+        error = future.exception()
+        if error is None:
+            record['status'] = future.result()
+            if self.failed(record['status']):
+                error = client.DocmailException(0, record['status'], 'mailing %s' % record['guid'])
+        if error is None:
+            record['stage'] = 'done'
+        else:
+            record['error'] = repr(error)
+            log.warn('%s failed at %s: %s', record['id'], record['stage'], record['error'])
+        write_record(self.fd, record)
+        self.condition.acquire()
+        try:
+            if error is None:
+                self.succeeded += 1
+            else:
+                self.errors += 1
+            self.pending -= 1
+            self.condition.notifyAll()
+        finally:
+            self.condition.release()
+
+    def wait(self):
+        """ waits for every tracked mailing, then stops the poller """
+        self.condition.acquire()
+        try:
+            while self.pending:
+                self.condition.wait(1)
+        finally:
+            self.condition.release()
+        self.poller.stop()
+
+def run(manifest, checkpoint, settings, retry_failed=False):
+    """ runs the mailings in the manifest that are not already complete in the
+        checkpoint. returns (succeeded, failed, skipped) counts
+    """
+    done = read_checkpoint(checkpoint)
+    skipped = [0]
+    failed = [0]
+    polled = []
+    def pending():
+        for entry in read_manifest(manifest):
+            record = done.get(entry['id'])
+            if record is None:
+                yield (entry, None)
+            elif record['stage'] == 'done' or (record['error'] is not None and not retry_failed):
+                skipped[0] += 1
+            elif unsafe(record):
+                failed[0] += 1
+                log.warn('%s not resumed: mailing %s may have been processed at docmail, check it',
+                         entry['id'], record['guid'])
+            elif record['stage'] in ('processed', 'get_process_status'):
+                # processed in a previous run: only the status is still to be polled
+                polled.append(record)
+            else:
+                yield (entry, record)
+
+    # warm the shared WSDL cache, so the workers load it rather than build it. the
+    # client also polls the statuses of the processed mailings
+    fd = open_checkpoint(settings)
+    tracker = Tracker(make_client(settings), fd, settings['timeout'])
+    pool = multiprocessing.Pool(settings['processes'], init_worker, (settings,))
+    try:
+        for record in pool.imap_unordered(run_entry, pending()):
+            write_record(fd, record)
+            while polled:
+                tracker.track(polled.pop())
+            if record['error'] is None:
+                tracker.track(record)
+            else:
+                failed[0] += 1
+                log.warn('%s failed at %s: %s', record['id'], record['stage'], record['error'])
+        pool.close()
+        while polled:
+            tracker.track(polled.pop())
+        tracker.wait()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        os.close(fd)
+    return tracker.succeeded, failed[0] + tracker.errors, skipped[0]
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [options] manifest checkpoint')
+    parser.add_option('--wsdl', default='test',
+                      help='live, test, beta or a WSDL url [default: %default]')
+    parser.add_option('--username', default=os.environ.get('DOCMAIL_USERNAME'),
+                      help='docmail username [default: $DOCMAIL_USERNAME]')
+    parser.add_option('--password', default=os.environ.get('DOCMAIL_PASSWORD'),
+                      help='docmail password [default: $DOCMAIL_PASSWORD]')
+    parser.add_option('--source', default='bulk', help='[default: %default]')
+    parser.add_option('--processes', type='int', default=multiprocessing.cpu_count(),
+                      help='number of worker processes [default: %default]')
+    parser.add_option('--rate', type='float', default=10,
+                      help='max api calls per second, 0 for no limit [default: %default]')
+    parser.add_option('--cache', default=os.path.join(tempfile.gettempdir(), 'docmail-bulk'),
+                      help='WSDL cache directory [default: %default]')
+    parser.add_option('--retry-failed', action='store_true', default=False,
+                      help='run mailings that failed in a previous run again')
+    parser.add_option('--timeout', type='float', default=client.BATCH_TIMEOUT,
+                      help='seconds to wait for the status of a processed mailing to be '
+                           'final [default: %default]')
+    opts, args = parser.parse_args(argv[1:])
+    if len(args) != 2 or not opts.username or not opts.password:
+        parser.print_help()
+        return 2
+    logging.basicConfig(level=logging.INFO)
+    settings = { 'username': opts.username,
+                 'password': opts.password,
+                 'source': opts.source,
+                 'wsdl_url': WSDL_URLS.get(opts.wsdl, opts.wsdl),
+                 'processes': max(opts.processes, 1),
+                 'rate': opts.rate,
+                 'cache': opts.cache,
+                 'checkpoint': args[1],
+                 'timeout': opts.timeout }
+    start = time.time()
+    succeeded, failed, skipped = run(args[0], args[1], settings, opts.retry_failed)
+    print '%d succeeded, %d failed, %d skipped (already done) in %.1fs' % (
+        succeeded, failed, skipped, time.time() - start)
+    return failed and 1 or 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+Compiles the docmail WSDL into a snapshot file, so that clients start without
+downloading, parsing and building the WSDL, eg (at build/deploy time):
+
+    python compile_wsdl.py test docmail-test.snapshot
+
+then:
+
+    client = docmail.client.Client(username, password, source,
+                                   wsdl_url=docmail.client.DOCMAIL_WSDL_TEST,
+                                   snapshot='docmail-test.snapshot')
+
+the snapshot is only used when it was compiled by the same suds version, from
+the same url and (unless snapshotcheck=False) from the current WSDL content.
+otherwise the client logs a warning and builds the WSDL as normal. for clients
+created with bundled_wsdl=True, compile the bundled copy (see update_wsdl.py):
+
+    python compile_wsdl.py --bundled test docmail-test.snapshot
+"""
+
+import sys
+import time
+
+from docmail import client
+from suds import snapshot
+
+WSDL_URLS = { 'live': client.DOCMAIL_WSDL_LIVE,
+              'test': client.DOCMAIL_WSDL_TEST,
+              'beta': client.DOCMAIL_WSDL_BETA }
+
+def main(argv):
+    bundled = '--bundled' in argv
+    if bundled:
+        argv = [arg for arg in argv if arg != '--bundled']
+    if len(argv) != 3:
+        print 'usage: %s [--bundled] live|test|beta|<wsdl url> <snapshot path>' % argv[0]
+        return 2
+    url = WSDL_URLS.get(argv[1], argv[1])
+    if bundled:
+        # the snapshot must be compiled from the url the client loads
+        url = client.resolve_wsdl_url(url)
+    start = time.time()
+    snapshot.compile(url, argv[2])
+    print 'compiled %s to %s in %.2fs' % (url, argv[2], time.time() - start)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -4,13 +4,10 @@ Overrides some stuff in suds to make it work with App Engine
 
 from google.appengine.api import memcache, urlfetch
 from suds import cache, client, transport
-from suds.client import Factory, ServiceSelector
+from suds.client import Factory, Messages, ServiceSelector
 from suds.options import Options
 from suds.plugin import PluginContainer
-from suds.reader import DefinitionsReader
-from suds.servicedefinition import ServiceDefinition
 from suds.transport.https import HttpAuthenticated
-from suds.wsdl import Definitions
 import docmail.client
 
 # 1. override the u2open method so that we do not call socket.setdefaulttimeout() (which is blocked on app engine)
@@ -39,28 +36,9 @@ transport.http.HttpTransport.u2open = u2open_appengine
 #urlfetch.fetch = new_fetch
 
 # 3. override cache.Cache to use memcache for caching purposes
-class MemCache(cache.Cache):
+class MemCache(cache.RemoteCache):
     def __init__(self, duration=3600):
-        self.duration = duration
-        self.client = memcache.Client()
-    
-    def get(self, id):
-        return self.client.get(str(id))
-
-    def getf(self, id):
-        return self.get(id)
-    
-    def put(self, id, object):
-        self.client.set(str(id), object, self.duration)
-    
-    def putf(self, id, fp):
-        self.put(id, fp)
-    
-    def purge(self, id):
-        self.client.delete(str(id))
-    
-    def clear(self):
-        self.client.flush_all()
+        cache.RemoteCache.__init__(self, memcache.Client(), duration)
         
 # 4. override the client.Client __init__() method to use the memcache implementation declared above
 class Client(docmail.client.Client):
@@ -70,24 +48,25 @@ class Client(docmail.client.Client):
         self.source = source
         self.username = username
         self.password = password
+        self.decimal_values = kwargs.pop('decimal_values', False)
         
         self.return_format = 'XML'           
         self.failure_return_format = 'XML'
 
 
+        bundled = kwargs.pop('bundled_wsdl', False)
+        check = kwargs.pop('check_bundled_wsdl', False)
+
         options = Options()
         options.transport = HttpAuthenticated()
         self.options = options
         options.cache = MemCache()
         self.set_options(**kwargs)
-        reader = DefinitionsReader(options, Definitions)
-        self.wsdl = reader.open(wsdl_url)
+        if bundled:
+            wsdl_url = docmail.client.resolve_wsdl_url(wsdl_url, check, options.transport)
+        self.wsdl, self.sd = self.load(wsdl_url)
         plugins = PluginContainer(options.plugins)
         plugins.init.initialized(wsdl=self.wsdl)
         self.factory = Factory(self.wsdl)
         self.service = ServiceSelector(self, self.wsdl.services)
-        self.sd = []
-        for s in self.wsdl.services:
-            sd = ServiceDefinition(self.wsdl, s)
-            self.sd.append(sd)
-        self.messages = dict(tx=None, rx=None)
\ No newline at end of file
+        self.messages = Messages()
\ No newline at end of file
@@ -0,0 +1,236 @@
+"""
+Receives the http posts docmail makes when a mailing has been processed
+(process_mailing's http_post_on_success / http_post_on_error), so that
+callers can wait for a mailing rather than polling get_process_status
+"""
+
+import BaseHTTPServer
+import cgi
+import hashlib
+import hmac
+import logging
+import SocketServer
+import threading
+import urllib
+import urlparse
+
+from collections import OrderedDict
+from docmail.future import Future
+
+log = logging.getLogger(__name__)
+
+SUCCESS = 'success'
+ERROR = 'error'
+
+# the fields docmail (or a proxy in front of us) may name the mailing with,
+# checked in order after our own 'mailing' query parameter
+GUID_FIELDS = ('mailing', 'MailingGUID', 'mailingguid', 'guid')
+
+# callbacks that arrive before expect() is called are kept, up to this many.
+# beyond that the oldest is dropped, with a warning
+MAX_UNCLAIMED = 1000
+
+# the largest request body CallbackServer reads. docmail's posts are small forms
+MAX_BODY = 64 * 1024
+
+class Callback(object):
+    """ a callback received for a mailing """
+    def __init__(self, mailing_guid, outcome, fields):
+        self.mailing_guid = mailing_guid
+        self.outcome = outcome
+        self.fields = fields
+
+    @property
+    def success(self):
+        return self.outcome == SUCCESS
+
+    def __repr__(self):
+        return '<Callback %s %s>' % (self.mailing_guid, self.outcome)
+
+class CallbackReceiver(object):
+    def __init__(self, base_url, secret=None):
+        """ matches incoming posts to pending mailings and resolves their futures.
+            - base_url - the public url docmail should post to, eg
+              'https://example.com/docmail/callback'
+            - secret - if given, callback urls carry a signature and posts
+              without a valid one are rejected. without one, anyone who can
+              reach the callback url can resolve any mailing's future
+            this is independent of any web framework - call handle() from your
+            own request handler, or use CallbackServer
+        """
+        self.base_url = base_url
+        self.secret = secret
+        if not secret:
+            log.warning('no callback secret: posts to %s are not authenticated, and any post '
+                        'naming a mailing will be accepted as its callback', base_url)
+        self._pending = {}
+        self._unclaimed = OrderedDict()
+        self._lock = threading.Lock()
+
+    def url(self, mailing_guid, outcome=SUCCESS):
+        """ returns the callback url for the mailing and outcome (SUCCESS or ERROR) """
+        params = [('mailing', mailing_guid), ('outcome', outcome)]
+        if self.secret:
+            params.append(('signature', self._sign(mailing_guid, outcome)))
+        separator = '?' in self.base_url and '&' or '?'
+        return self.base_url + separator + urllib.urlencode(params)
+
+    def process_args(self, mailing_guid):
+        """ returns the keyword arguments to pass to Client.process_mailing, eg
+            client.process_mailing(guid, submit=True, **receiver.process_args(guid))
+        """
+        return { 'http_post_on_success': self.url(mailing_guid, SUCCESS),
+                 'http_post_on_error': self.url(mailing_guid, ERROR) }
+
+    def expect(self, mailing_guid, callback=None):
+        """ returns a Future that resolves to a Callback when docmail posts for the
+            mailing. callback(Callback) is also called then
+        """
+        self._lock.acquire()
+        try:
+            future = self._pending.get(mailing_guid)
+            if future is None:
+                future = self._pending[mailing_guid] = Future()
+            received = self._unclaimed.pop(mailing_guid, None)
+            if received is not None:
+                del self._pending[mailing_guid]
+        finally:
+            self._lock.release()
+        if callback is not None:
+            future.add_done_callback(lambda f: callback(f.result()))
+        if received is not None:
+            future.set_result(received)
+        return future
+
+    def cancel(self, mailing_guid):
+        """ stops waiting for the mailing. its future is left unresolved """
+        self._lock.acquire()
+        try:
+            self._pending.pop(mailing_guid, None)
+        finally:
+            self._lock.release()
+
+    def pending(self):
+        """ returns the guids of mailings still waiting for a callback """
+        self._lock.acquire()
+        try:
+            return self._pending.keys()
+        finally:
+            self._lock.release()
+
+    def handle(self, path, body='', content_type='application/x-www-form-urlencoded'):
+        """ handles a post to the callback url. path is the request path including
+            the query string. returns (http status code, message)
+        """
+        fields = {}
+        query = urlparse.urlsplit(path)[3]
+        if body and (content_type or '').startswith('application/x-www-form-urlencoded'):
+            fields.update(self._fields(body))
+        fields.update(self._fields(query))
+        mailing_guid = None
+        for name in GUID_FIELDS:
+            if fields.get(name):
+                mailing_guid = fields[name]
+                break
+        if mailing_guid is None:
+            return 400, 'no mailing guid'
+        outcome = fields.get('outcome', SUCCESS)
+        if outcome not in (SUCCESS, ERROR):
+            return 400, 'unknown outcome'
+        if self.secret and not self._verify(mailing_guid, outcome, fields.get('signature', '')):
+            return 403, 'bad signature'
+        received = Callback(mailing_guid, outcome, fields)
+        dropped = None
+        self._lock.acquire()
+        try:
+            future = self._pending.pop(mailing_guid, None)
+            if future is None:
+                self._unclaimed.pop(mailing_guid, None)
+                if len(self._unclaimed) >= MAX_UNCLAIMED:
+                    dropped = self._unclaimed.popitem(last=False)[1]
+                self._unclaimed[mailing_guid] = received
+        finally:
+            self._lock.release()
+        if dropped is not None:
+            log.warning('%d callbacks not yet expected, dropped the oldest: %r',
+                        MAX_UNCLAIMED, dropped)
+        log.debug('callback for %s: %s', mailing_guid, outcome)
+        if future is not None:
+            future.set_result(received)
+        return 200, 'OK'
+
+    def _fields(self, qs):
+        return dict(cgi.parse_qsl(qs, keep_blank_values=True))
+
+    def _sign(self, mailing_guid, outcome):
+        return hmac.new(self.secret, '%s:%s' % (mailing_guid, outcome), hashlib.sha1).hexdigest()
+
+    def _verify(self, mailing_guid, outcome, signature):
+        expected = self._sign(mailing_guid, outcome)
+        if isinstance(signature, unicode):
+            # eg from a web framework's request. compare_digest won't mix types
+            try:
+                signature = signature.encode('ascii')
+            except UnicodeError:
+                return False
+        if hasattr(hmac, 'compare_digest'):
+            # python 2.7.7+
+            return hmac.compare_digest(expected, signature)
+        if len(expected) != len(signature):
+            return False
+        diff = 0
+        for a, b in zip(expected, signature):
+            diff |= ord(a) ^ ord(b)
+        return diff == 0
+
+class _RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_POST(self):
+        try:
+            length = int(self.headers.getheader('content-length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            code, message = 400, 'bad content-length'
+        elif length > MAX_BODY:
+            code, message = 413, 'body too large'
+        else:
+            body = length and self.rfile.read(length) or ''
+            try:
+                code, message = self.server.receiver.handle(self.path, body,
+                                                            self.headers.getheader('content-type'))
+            except Exception:
+                log.exception('callback handling failed')
+                code, message = 500, 'error'
+        if code in (400, 413):
+            # the body was not read, so the connection can't be reused
+            self.close_connection = 1
+        self.send_response(code)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(message)))
+        self.end_headers()
+        self.wfile.write(message)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        log.debug('%s - %s', self.address_string(), format % args)
+
+class CallbackServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """ a small embeddable http server that passes posts to a CallbackReceiver """
+    daemon_threads = True
+
+    def __init__(self, receiver, address=('', 8080)):
+        BaseHTTPServer.HTTPServer.__init__(self, address, _RequestHandler)
+        self.receiver = receiver
+        self._thread = None
+
+    def start(self):
+        """ serves on a background thread """
+        self._thread = threading.Thread(target=self.serve_forever, name='docmail-callbacks')
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread = None
@@ -39,14 +39,31 @@ __author__ = 'gwyn.howell@appogee.co.uk (Gwyn Howell)'
 __version__ = '1.0'
 __license__ = 'Apache License 2.0 (http://www.apache.org/licenses/LICENSE-2.0)'
 
-from xml.dom.minidom import parseString
+from cStringIO import StringIO
 import base64
 import datetime
-import os.path
+import decimal
+import hashlib
+import httplib
+import json
+import logging
+import os
+import Queue
 import re
+import socket
+import threading
+import urllib2
+import uuid
 import suds.client
+from suds.store import DocumentStore
+from suds.transport import Request, TransportError
+from suds.transport.nonblocking import AsyncHttpTransport
+from suds.transport.pool import HttpPooled
 
 from docmail import enums, util
+from docmail.future import Future
+from docmail.poller import FAILED_STATUSES, StatusPoller, matcher, terminal_statuses
+from docmail.upload import Base64Stream, StreamedMessage
 
 DOCMAIL_WSDL_LIVE = 'https://www.cfhdocmail.com/LiveAPI2/DMWS.asmx?WSDL'
 DOCMAIL_WSDL_TEST = 'https://www.cfhdocmail.com/TestAPI2/DMWS.asmx?WSDL'
@@ -57,9 +74,127 @@ NOTE: Change this to whichever API you want to use. You will need
       a separate account for each. See README for further info """
 DOCMAIL_WSDL = DOCMAIL_WSDL_TEST
 
+# versioned copies of the docmail WSDLs, written by update_wsdl.py and served
+# from the suds document store, so a client can be built without downloading
+# the WSDL. manifest.json records the sha1, url and fetch time of each copy.
+# the copies aren't in the repository, so clients only use them when created
+# with bundled_wsdl=True after update_wsdl.py has been run
+WSDL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wsdl')
+WSDL_MANIFEST = os.path.join(WSDL_DIR, 'manifest.json')
+BUNDLED_WSDL = { DOCMAIL_WSDL_LIVE: 'live.wsdl',
+                 DOCMAIL_WSDL_TEST: 'test.wsdl',
+                 DOCMAIL_WSDL_BETA: 'beta.wsdl' }
+
+def _register_bundled_wsdl():
+    for url, name in BUNDLED_WSDL.items():
+        if bundled_wsdl_version(url) is not None:
+            DocumentStore.register('docmail/' + name, os.path.join(WSDL_DIR, name))
+
 RE_DATETIME = '^(0[1-9]|[12][0-9]|3[01])[/](0[1-9]|1[012])[/](19|20)\d\d[ ]([0-1][0-9]|2[0-3])[:][0-5][0-9][:][0-5][0-9]$'
 PTN_DATETIME = '%d/%m/%Y %H:%M:%S'
 
+# classifies a docmail value in one match - a datetime (in PTN_DATETIME format),
+# a yes/no boolean or a decimal (eg balances and prices). decimals are only
+# converted by clients created with decimal_values=True (see Client)
+RE_VALUE = re.compile(r'^(?:(?P<day>0[1-9]|[12][0-9]|3[01])/(?P<month>0[1-9]|1[012])/(?P<year>(?:19|20)\d\d) '
+                      r'(?P<hour>[0-1][0-9]|2[0-3]):(?P<minute>[0-5][0-9]):(?P<second>[0-5][0-9])'
+                      r'|(?P<yes>[Yy][Ee][Ss])|(?P<no>[Nn][Oo])|(?P<decimal>-?\d+\.\d+))$')
+
+# formatted keys by docmail key. docmail uses a small, fixed set of keys
+# so the cache is simply emptied if it ever grows beyond KEY_CACHE_SIZE
+KEY_CACHE_SIZE = 1024
+_key_cache = {}
+
+log = logging.getLogger(__name__)
+
+def bundled_wsdl_version(wsdl_url):
+    """ returns the manifest entry (sha1, url, fetched) for the bundled copy of
+        wsdl_url, or None if there isn't one
+    """
+    name = BUNDLED_WSDL.get(wsdl_url)
+    if name is None or not os.path.exists(os.path.join(WSDL_DIR, name)):
+        return None
+    try:
+        fp = open(WSDL_MANIFEST)
+        try:
+            return json.load(fp).get(name)
+        finally:
+            fp.close()
+    except (IOError, ValueError):
+        return None
+
+_register_bundled_wsdl()
+
+def fetch_wsdl(wsdl_url, transport=None):
+    """ downloads the WSDL, bypassing any bundled copy """
+    fp = (transport or HttpPooled()).open(Request(wsdl_url))
+    try:
+        return fp.read()
+    finally:
+        fp.close()
+
+def resolve_wsdl_url(wsdl_url, check=False, transport=None):
+    """ returns the suds:// url of the bundled copy of wsdl_url, or wsdl_url
+        itself if there is no bundled copy. if check is True the remote WSDL is
+        downloaded and the bundled copy is only used if it is identical
+    """
+    version = bundled_wsdl_version(wsdl_url)
+    if version is None:
+        if wsdl_url in BUNDLED_WSDL:
+            log.warn('no bundled WSDL for %s, downloading it (run update_wsdl.py to bundle it)',
+                     wsdl_url)
+        return wsdl_url
+    name = BUNDLED_WSDL[wsdl_url]
+    if check:
+        fp = open(os.path.join(WSDL_DIR, name), 'rb')
+        try:
+            bundled = hashlib.sha1(fp.read()).hexdigest()
+        finally:
+            fp.close()
+        try:
+            remote = hashlib.sha1(fetch_wsdl(wsdl_url, transport)).hexdigest()
+        except (TransportError, urllib2.URLError, socket.error, httplib.HTTPException), e:
+            # eg offline - use the bundled copy
+            log.warn('could not check bundled WSDL for %s: %s', wsdl_url, e)
+            remote = bundled
+        if remote != bundled:
+            log.warn('bundled WSDL for %s (fetched %s) is out of date, using the remote copy',
+                     wsdl_url, version.get('fetched'))
+            return wsdl_url
+    return 'suds://docmail/' + name
+
+def update_bundled_wsdl(wsdl_url, transport=None):
+    """ downloads wsdl_url, saves it as the bundled copy and records it in the
+        manifest. returns the manifest entry
+    """
+    name = BUNDLED_WSDL[wsdl_url]
+    content = fetch_wsdl(wsdl_url, transport)
+    if not os.path.isdir(WSDL_DIR):
+        os.makedirs(WSDL_DIR)
+    fp = open(os.path.join(WSDL_DIR, name), 'wb')
+    try:
+        fp.write(content)
+    finally:
+        fp.close()
+    try:
+        fp = open(WSDL_MANIFEST)
+        try:
+            manifest = json.load(fp)
+        finally:
+            fp.close()
+    except (IOError, ValueError):
+        manifest = {}
+    manifest[name] = { 'url': wsdl_url,
+                       'sha1': hashlib.sha1(content).hexdigest(),
+                       'fetched': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ') }
+    fp = open(WSDL_MANIFEST, 'w')
+    try:
+        json.dump(manifest, fp, indent=2, sort_keys=True)
+    finally:
+        fp.close()
+    DocumentStore.register('docmail/' + name, os.path.join(WSDL_DIR, name))
+    return manifest[name]
+
 # some default values for processing a mailing
 PROCESS_MAILING = { 'po_reference': '', 
                     'payment_method': 'Topup', 
@@ -115,7 +250,56 @@ class Mailing(DocmailObject):
         else:
             self.despatch_asap = False
 
-class TemplateFile(object):
+class UploadFile(object):
+    def _set_file(self, file, data):
+        """ files given by path or file object are not read up front - they are
+            streamed into the request as base64 when the file is uploaded
+        """
+        self._data = None
+        self._path = None
+        self._file = None
+        if data:
+            self.file_name = file
+            self._data = data
+        elif isinstance(file, basestring) and os.path.isfile(file):
+            self.file_name = file
+            self._path = file
+            self._offset = None
+        else:
+            self.file_name = file.name
+            self._file = file
+            try:
+                self._offset = file.tell()
+            except (AttributeError, IOError):
+                self._offset = None
+    
+    def _get_file_data(self):
+        if self._data is not None:
+            return self._data
+        if self._path is not None:
+            fp = open(self._path, 'rb')
+            try:
+                return fp.read()
+            finally:
+                fp.close()
+        if self._offset is not None:
+            self._file.seek(self._offset)
+        return self._file.read()
+    
+    def _set_file_data(self, data):
+        self._data = data
+    
+    file_data = property(_get_file_data, _set_file_data)
+    
+    def encoded(self):
+        """ returns the base64 encoded file data - as a string if the data is in
+            memory, otherwise as a Base64Stream which is encoded as it is sent
+        """
+        if self._data is not None:
+            return base64.b64encode(self._data)
+        return Base64Stream(self._path, self._file, self._offset)
+
+class TemplateFile(UploadFile):
     def __init__(self, file, data=None):
         """ creates a template file object. can be created from:
             - file object - specify file=file object
@@ -123,16 +307,7 @@ class TemplateFile(object):
             - bytes - specify file=filename and data=bytes
         """
         
-        if data:
-            self.file_name = file
-            self.file_data = data
-        else:
-            if isinstance(file, basestring):
-                if os.path.isfile(file):
-                    file = open(file, 'r')
-            
-            self.file_name = file.name
-            self.file_data = file.read()
+        self._set_file(file, data)
         
         ext = self.file_name[self.file_name.rfind('.')+1:].lower()
         if not ext in ('doc', 'docx', 'rtf'):
@@ -155,7 +330,7 @@ class TemplateFile(object):
         self.instances = 1
         self.cycle_instances_on_copies = False
 
-class MailingListFile(object):
+class MailingListFile(UploadFile):
     def __init__(self, file, data=None, sheet_name=None, data_format=None, mapping_delimiter=None, mapping_fixed_width_chars=None):
         """ creates a mailing list file object. can be created from:
             - file object - specify file=file object
@@ -163,16 +338,7 @@ class MailingListFile(object):
             - bytes - specify file=filename and data=bytes
         """
 
-        if data:
-            self.file_name = file
-            self.file_data = data
-        else:
-            if isinstance(file, basestring):
-                if os.path.isfile(file):
-                    file = open(file, 'r')
-            
-            self.file_name = file.name
-            self.file_data = file.read()
+        self._set_file(file, data)
 
         ext = self.file_name[self.file_name.rfind('.')+1:].lower()
         if ext == 'csv':
@@ -201,32 +367,101 @@ class MailingListFile(object):
         self.sheet_name = sheet_name or ''
         self.mapping_fixed_width_chars = mapping_fixed_width_chars or ''
 
+# the default number of seconds submit_batch waits for a processed mailing's
+# status to be terminal, after which the job fails
+BATCH_TIMEOUT = 4 * 3600
+
+class BatchJob(object):
+    def __init__(self, mailing, template_files=None, mailing_list_file=None, submit=False, partial_process=True, **process_args):
+        """ a mailing to be run through the Client.submit_batch pipeline:
+            create_mailing -> add_template_file (for each template) -> add_mailing_list_file
+            -> process_mailing -> get_process_status (polled until the status is terminal:
+            see poller.terminal_statuses for the statuses of each submit/partial_process)
+            template_files may be a single TemplateFile or a list of them. the remaining
+            args are passed to process_mailing
+        """
+        if isinstance(template_files, TemplateFile):
+            template_files = [template_files]
+        self.mailing = mailing
+        self.template_files = template_files or []
+        self.mailing_list_file = mailing_list_file
+        self.submit = submit
+        self.partial_process = partial_process
+        self.process_args = process_args
+
+class BatchResult(object):
+    def __init__(self, job):
+        """ the outcome of a BatchJob. if a stage failed, stage is the name of the
+            failed stage and error holds the exception, otherwise stage is 'done',
+            error is None and status is the terminal process status. completed is
+            the number of stages completed
+        """
+        self.job = job
+        self.mailing = job.mailing
+        self.stage = None
+        self.completed = 0
+        self.error = None
+        self.status = None
+    
+    @property
+    def success(self):
+        return self.error is None
+
 class Client(suds.client.Client):
+    """ a docmail api client. a client is thread-safe: one client (and its pool
+        of connections) may be shared by a pool of worker threads. use view() for
+        a client for another account rather than changing username/password/source
+        on a shared client. last_sent()/last_received() return the messages of the
+        calling thread's last call. a client created with decimal_values=True
+        returns decimal values (eg prices) as decimal.Decimal rather than str
+    """
+    decimal_values = False
+
     def __init__(self, username, password, source='', wsdl_url=None, **kwargs):
         if not wsdl_url:
             wsdl_url = DOCMAIL_WSDL
         self.source = source
         self.username = username
         self.password = password
+        self.decimal_values = kwargs.pop('decimal_values', False)
         
         self.return_format = 'XML'           
         self.failure_return_format = 'XML'
+        if not kwargs.has_key('transport'):
+            kwargs['transport'] = HttpPooled()
+        # bundled_wsdl uses the bundled copy of the WSDL, if update_wsdl.py has
+        # written one. check_bundled_wsdl compares it with the remote copy first
+        # (costs one download)
+        if kwargs.pop('bundled_wsdl', False):
+            wsdl_url = resolve_wsdl_url(wsdl_url, kwargs.pop('check_bundled_wsdl', False),
+                                        kwargs['transport'])
+        kwargs.pop('check_bundled_wsdl', None)
         suds.client.Client.__init__(self, wsdl_url, **kwargs)
         
+    def view(self, username=None, password=None, source=None, **kwargs):
+        """ returns a client for another docmail account that shares this client's
+            WSDL model and transport (see suds.client.Client.view). creating one
+            builds nothing, so a client per account costs almost no time or memory
+        """
+        view = suds.client.Client.view(self, **kwargs)
+        if username is not None:
+            view.username = username
+        if password is not None:
+            view.password = password
+        if source is not None:
+            view.source = source
+        return view
+        
     def _parse(self, xml, return_class=DocmailObject):
         ob = return_class()
-        dom = parseString(xml)
-        for node in dom.firstChild.childNodes:
-            key = node.childNodes[0].firstChild.wholeText
-            value = node.childNodes[1].firstChild.wholeText
-            
-            key = self._format_key(key)
-            value = self._format_value(value)
+        for record in util.parse_records(xml):
+            key = self._format_key(record[0])
+            value = self._format_value(record[1])
             
             if key == 'error_code':
                 raise DocmailException(value,
-                   self._format_value(node.childNodes[3].firstChild.wholeText),
-                   self._format_value(node.childNodes[5].firstChild.wholeText))
+                   self._format_value(record[3]),
+                   self._format_value(record[5]))
             
             setattr(ob, key, value)
         if hasattr(ob, '_format_data'):
@@ -234,161 +469,411 @@ class Client(suds.client.Client):
         return ob
         
     def _format_key(self, key):
-        if not ' ' in key:
-            key = '_'.join(util.split_caps(key))
-        key = key.strip('\/:*?"<>|').replace(' ', '_').lower()
-        return key
+        try:
+            return _key_cache[key]
+        except KeyError:
+            pass
+        formatted = key
+        if not ' ' in formatted:
+            formatted = '_'.join(util.split_caps(formatted))
+        formatted = formatted.strip('\/:*?"<>|').replace(' ', '_').lower()
+        if len(_key_cache) >= KEY_CACHE_SIZE:
+            _key_cache.clear()
+        _key_cache[key] = formatted
+        return formatted
     
     def _format_value(self, value):
-        if re.match(RE_DATETIME, value):
-            return datetime.datetime.strptime(value, PTN_DATETIME)
-        if value.lower() == 'yes':
+        match = RE_VALUE.match(value)
+        if match is None:
+            return value
+        kind = match.lastgroup
+        if kind == 'yes':
             return True
-        if value.lower() == 'no':
+        if kind == 'no':
             return False
-        return value
+        if kind == 'decimal':
+            if self.decimal_values:
+                return decimal.Decimal(value)
+            return value
+        return datetime.datetime(*[int(n) for n in match.group('year', 'month', 'day',
+                                                               'hour', 'minute', 'second')])
+    
+    def _call(self, operation, args, handler):
+        """ invokes a docmail operation and returns handler(xml) for the xml it returns """
+        if not [arg for arg in args if isinstance(arg, Base64Stream)]:
+            xml = getattr(self.service, operation)(*args)
+            return handler(xml)
+        soapclient, binding, request = self._prepare(operation, args)
+        if self.options.nosend:
+            return handler(suds.client.RequestContext(soapclient, binding, request.message))
+        try:
+            reply = self.options.transport.send(request)
+            if reply is None:
+                xml = None
+            else:
+                xml = soapclient.received(binding, reply)
+        except TransportError, e:
+            xml = soapclient.rejected(binding, e)
+        return handler(xml)
+    
+    def _prepare(self, operation, args):
+        """ builds the transport request for a docmail operation. a Base64Stream arg
+            is serialised as a placeholder which is then replaced by the stream, so
+            the request body is encoded from the file as it is sent. the request
+            is built by SoapClient.request so plugins and prettyxml apply as usual
+            returns (soapclient, binding, request)
+        """
+        method = getattr(self.service, operation).method
+        soapclient = suds.client.SoapClient(self, method)
+        binding = method.binding.input
+        stream = None
+        args = list(args)
+        for i, arg in enumerate(args):
+            if isinstance(arg, Base64Stream):
+                stream = arg
+                marker = 'docmailupload%s' % uuid.uuid4().hex
+                args[i] = marker
+        soapenv = soapclient.bound(binding.get_template_message, method, args, {})
+        if soapenv is None:
+            soapenv = soapclient.bound(binding.get_message, method, args, {})
+        request = soapclient.request(soapenv)
+        if stream is not None:
+            prefix, suffix = request.message.split(marker)
+            request.message = StreamedMessage(prefix, stream, suffix)
+        return soapclient, binding, request
     
     def get_mailing(self, guid):
-        xml = self.service.GetMailingDetails(self.username, self.password, guid, self.return_format)
-        mailing = self._parse(xml, Mailing)
-        mailing.guid = guid
-        return mailing
+        def handler(xml):
+            mailing = self._parse(xml, Mailing)
+            mailing.guid = guid
+            return mailing
+        return self._call('GetMailingDetails',
+                          (self.username, self.password, guid, self.return_format),
+                          handler)
     
     def create_mailing(self, mailing):
-        xml = self.service.CreateMailing(self.username, self.password, self.source,
-                                         mailing.product_type, 
-                                         mailing.name, 
-                                         mailing.mailing_description,
-                                         not mailing.is_colour, 
-                                         mailing.is_duplex, 
-                                         mailing.delivery_type, 
-                                         mailing.courier_delivery_to_self, 
-                                         mailing.despatch_asap, 
-                                         mailing.despatch_date, 
-                                         mailing.address_name_prefix, 
-                                         mailing.address_name_format, 
-                                         mailing.discount_code, 
-                                         mailing.min_envelope_size, 
-                                         self.return_format)
-        ob = self._parse(xml)
-        mailing.guid = ob.mailing_guid
-        return mailing
+        def handler(xml):
+            ob = self._parse(xml)
+            mailing.guid = ob.mailing_guid
+            return mailing
+        return self._call('CreateMailing',
+                          (self.username, self.password, self.source,
+                           mailing.product_type, 
+                           mailing.name, 
+                           mailing.mailing_description,
+                           not mailing.is_colour, 
+                           mailing.is_duplex, 
+                           mailing.delivery_type, 
+                           mailing.courier_delivery_to_self, 
+                           mailing.despatch_asap, 
+                           mailing.despatch_date, 
+                           mailing.address_name_prefix, 
+                           mailing.address_name_format, 
+                           mailing.discount_code, 
+                           mailing.min_envelope_size, 
+                           self.return_format),
+                          handler)
     
     def update_mailing(self, mailing):
-        xml = self.service.UpdateMailingOptions(self.username, self.password, 
-                                                mailing.guid, 
-                                                mailing.name, 
-                                                mailing.mailing_description, 
-                                                not mailing.is_colour, 
-                                                mailing.is_duplex, 
-                                                mailing.delivery_type, 
-                                                mailing.despatch_asap, 
-                                                mailing.despatch_date, 
-                                                mailing.address_name_prefix, 
-                                                mailing.address_name_format, 
-                                                mailing.discount_code, 
-                                                mailing.min_envelope_size, 
-                                                self.return_format)
-        ob = self._parse(xml)
-        return ob.success
+        return self._call('UpdateMailingOptions',
+                          (self.username, self.password, 
+                           mailing.guid, 
+                           mailing.name, 
+                           mailing.mailing_description, 
+                           not mailing.is_colour, 
+                           mailing.is_duplex, 
+                           mailing.delivery_type, 
+                           mailing.despatch_asap, 
+                           mailing.despatch_date, 
+                           mailing.address_name_prefix, 
+                           mailing.address_name_format, 
+                           mailing.discount_code, 
+                           mailing.min_envelope_size, 
+                           self.return_format),
+                          lambda xml: self._parse(xml).success)
     
     def add_template_file(self, mailing_guid, template_file):
-        xml = self.service.AddTemplateFile(self.username, self.password, mailing_guid, 
-                                           template_file.template_name, 
-                                           template_file.file_name, 
-                                           base64.b64encode(template_file.file_data), 
-                                           template_file.document_type, 
-                                           template_file.addressed_document, 
-                                           template_file.address_font_code, 
-                                           template_file.template_type, 
-                                           template_file.background_name, 
-                                           template_file.can_begin_on_back, 
-                                           template_file.next_template_can_begin_on_back, 
-                                           template_file.protected_area_password, 
-                                           template_file.encryption_password, 
-                                           template_file.bleed_supplied, 
-                                           template_file.copies, 
-                                           template_file.instances, 
-                                           template_file.instance_page_numbers, 
-                                           template_file.cycle_instances_on_copies, 
-                                           self.return_format)
-        ob = self._parse(xml)
-        template_file.guid = ob.template_guid
-        return template_file
+        def handler(xml):
+            ob = self._parse(xml)
+            template_file.guid = ob.template_guid
+            return template_file
+        return self._call('AddTemplateFile',
+                          (self.username, self.password, mailing_guid, 
+                           template_file.template_name, 
+                           template_file.file_name, 
+                           template_file.encoded(), 
+                           template_file.document_type, 
+                           template_file.addressed_document, 
+                           template_file.address_font_code, 
+                           template_file.template_type, 
+                           template_file.background_name, 
+                           template_file.can_begin_on_back, 
+                           template_file.next_template_can_begin_on_back, 
+                           template_file.protected_area_password, 
+                           template_file.encryption_password, 
+                           template_file.bleed_supplied, 
+                           template_file.copies, 
+                           template_file.instances, 
+                           template_file.instance_page_numbers, 
+                           template_file.cycle_instances_on_copies, 
+                           self.return_format),
+                          handler)
     
     def add_mailing_list_file(self, mailing_guid, mailing_list_file):
-        xml = self.service.AddMailingListFile(self.username, self.password, mailing_guid, 
-                                              mailing_list_file.file_name,
-                                              base64.b64encode(mailing_list_file.file_data), 
-                                              mailing_list_file.data_format,
-                                              mailing_list_file.headers, 
-                                              mailing_list_file.sheet_name, 
-                                              mailing_list_file.mapping_delimiter, 
-                                              mailing_list_file.mapping_fixed_width_chars, 
-                                              mailing_list_file.mapping_name, 
-                                              self.return_format)
-        ob = self._parse(xml)
-        mailing_list_file.guid = ob.mailing_list_guid
-        return mailing_list_file
+        def handler(xml):
+            ob = self._parse(xml)
+            mailing_list_file.guid = ob.mailing_list_guid
+            return mailing_list_file
+        return self._call('AddMailingListFile',
+                          (self.username, self.password, mailing_guid, 
+                           mailing_list_file.file_name,
+                           mailing_list_file.encoded(), 
+                           mailing_list_file.data_format,
+                           mailing_list_file.headers, 
+                           mailing_list_file.sheet_name, 
+                           mailing_list_file.mapping_delimiter, 
+                           mailing_list_file.mapping_fixed_width_chars, 
+                           mailing_list_file.mapping_name, 
+                           self.return_format),
+                          handler)
     
     def process_mailing(self, mailing_guid, submit=False, partial_process=True, **args):
         args['ReturnFormat'] = self.return_format
         for k, v in PROCESS_MAILING.items():
             if not args.has_key(k):
                 args[k] = v
-        xml = self.service.ProcessMailing(self.username, self.password,
-                                          mailing_guid, self.source,
-                                          submit, partial_process,
-                                          args['max_price_ex_vat'], 
-                                          args['po_reference'],
-                                          args['payment_method'], 
-                                          args['skip_preview_image_generation'], 
-                                          args['email_success_list'],
-                                          args['email_error_list'], 
-                                          args['http_post_on_success'],
-                                          args['http_post_on_error'], 
-                                          self.return_format)
-        return self._parse(xml).success
+        return self._call('ProcessMailing',
+                          (self.username, self.password,
+                           mailing_guid, self.source,
+                           submit, partial_process,
+                           args['max_price_ex_vat'], 
+                           args['po_reference'],
+                           args['payment_method'], 
+                           args['skip_preview_image_generation'], 
+                           args['email_success_list'],
+                           args['email_error_list'], 
+                           args['http_post_on_success'],
+                           args['http_post_on_error'], 
+                           self.return_format),
+                          lambda xml: self._parse(xml).success)
     
     def get_process_status(self, mailing_guid):
-        xml = self.service.GetStatus(self.username, self.password,
-                                      mailing_guid, self.return_format)
-        return self._parse(xml).status
+        return self._call('GetStatus',
+                          (self.username, self.password,
+                           mailing_guid, self.return_format),
+                          lambda xml: self._parse(xml).status)
     
     def get_topup_balance(self):
         """ Returns a float representing current balance for a topup account """
-        xml = self.service.GetBalance(self.username, self.password, 
-                                      'Topup', self.return_format)
-        return float(self._parse(xml).current_balance)
+        return self._call('GetBalance',
+                          (self.username, self.password, 
+                           'Topup', self.return_format),
+                          lambda xml: float(self._parse(xml).current_balance))
     
     def get_invoice_balance(self):
         """ Returns a float representing current balance for a topup account """
-        xml = self.service.GetBalance(self.username, self.password, 
-                                      'Invoice', self.return_format)
-        return float(self._parse(xml).current_balance)
+        return self._call('GetBalance',
+                          (self.username, self.password, 
+                           'Invoice', self.return_format),
+                          lambda xml: float(self._parse(xml).current_balance))
     
     def delete_mail_pack(self, mailing_guid):
-        xml = self.service.DeleteMailPack(self.username, self.password, 
-                                          mailing_guid, self.return_format)
-        return self._parse(xml).success
+        return self._call('DeleteMailPack',
+                          (self.username, self.password, 
+                           mailing_guid, self.return_format),
+                          lambda xml: self._parse(xml).success)
     
     def delete_mailing_list(self, mailing_guid):
-        xml = self.service.DeleteMailingList(self.username, self.password, 
-                                             mailing_guid, self.return_format)
-        return self._parse(xml).success
+        return self._call('DeleteMailingList',
+                          (self.username, self.password, 
+                           mailing_guid, self.return_format),
+                          lambda xml: self._parse(xml).success)
     
     def add_self(self, mailing_guid):
-        xml = self.service.DeleteMailingList(self.username, self.password, 
-                                             mailing_guid, self.return_format)
-        return self._parse(xml).success
+        return self._call('DeleteMailingList',
+                          (self.username, self.password, 
+                           mailing_guid, self.return_format),
+                          lambda xml: self._parse(xml).success)
     
     def auto_correct_addresses(self, mailing_guid, correction_method='Cost'):
-        xml = self.service.AutoCorrectAddresses(self.username, self.password, 
-                                             mailing_guid, correction_method,
-                                             self.return_format)
-        return self._parse(xml).success
+        return self._call('AutoCorrectAddresses',
+                          (self.username, self.password, 
+                           mailing_guid, correction_method,
+                           self.return_format),
+                          lambda xml: self._parse(xml).success)
     
     def cancel_mailing_approval(self, mailing_guid):
-        xml = self.service.CancelMailingApproval(self.username, self.password, 
-                                                 mailing_guid, self.return_format)
-        return self._parse(xml).success
\ No newline at end of file
+        return self._call('CancelMailingApproval',
+                          (self.username, self.password, 
+                           mailing_guid, self.return_format),
+                          lambda xml: self._parse(xml).success)
+    
+    def submit_batch(self, jobs, workers=4, poller=None, timeout=BATCH_TIMEOUT):
+        """ runs each BatchJob through the mailing pipeline, with up to workers jobs
+            in progress at once. a failure in any stage of a job stops that job only.
+            the jobs are started before this returns, and the status of each mailing
+            is polled until it is terminal with poller (a StatusPoller shared by the
+            batch, stopped when the batch ends, if not given). a job fails with a
+            DocmailException if its mailing fails, is cancelled, or is not processed
+            within timeout seconds.
+            returns an iterator that yields a BatchResult for each job as it completes
+            (not necessarily in the order given)
+        """
+        pending = Queue.Queue()
+        results = Queue.Queue()
+        count = 0
+        for job in jobs:
+            pending.put(job)
+            count += 1
+        running = [min(workers, count)]
+        lock = threading.Lock()
+        owned = poller is None
+        if owned:
+            poller = StatusPoller(self)
+        
+        def worker():
+            try:
+                while True:
+                    try:
+                        job = pending.get_nowait()
+                    except Queue.Empty:
+                        return
+                    results.put(self._run_batch_job(job, poller, timeout=timeout))
+            finally:
+                lock.acquire()
+                try:
+                    running[0] -= 1
+                    last = not running[0]
+                finally:
+                    lock.release()
+                if last and owned:
+                    poller.stop()
+        
+        for i in range(running[0]):
+            thread = threading.Thread(target=worker, name='docmail-batch-%d' % i)
+            thread.setDaemon(True)
+            thread.start()
+        return (results.get() for i in range(count))
+    
+    def _run_batch_job(self, job, poller=None, completed=0, progress=None,
+                       timeout=BATCH_TIMEOUT, poll=True):
+        """ runs a BatchJob in the calling thread and returns its BatchResult.
+            without a poller, one is created for (and stopped after) this job.
+            to resume a job, completed is the number of stages to skip (the
+            mailing's guid must be set once create_mailing is skipped).
+            progress(result, running) is called as each stage starts (running is
+            True) and completes (running is False), eg to checkpoint the job.
+            without poll, the job ends at stage 'processed' once process_mailing
+            succeeds, for the caller to poll the status (see _wait_processed)
+        """
+        if poller is None and poll:
+            poller = StatusPoller(self)
+            try:
+                return self._run_batch_job(job, poller, completed, progress, timeout)
+            finally:
+                poller.stop()
+        result = BatchResult(job)
+        result.completed = completed
+        value = None
+        stages = [('create_mailing', lambda: self.create_mailing(job.mailing))]
+        for template_file in job.template_files:
+            stages.append(('add_template_file', 
+                           lambda t=template_file: self.add_template_file(job.mailing.guid, t)))
+        if job.mailing_list_file:
+            stages.append(('add_mailing_list_file', 
+                           lambda: self.add_mailing_list_file(job.mailing.guid, job.mailing_list_file)))
+        stages.append(('process_mailing', 
+                       lambda: self.process_mailing(job.mailing.guid, job.submit, 
+                                                    job.partial_process, **job.process_args)))
+        if poll:
+            stages.append(('get_process_status', 
+                           lambda: self._wait_processed(job, poller, timeout)))
+        for stage, fn in stages[completed:]:
+            result.stage = stage
+            if progress is not None:
+                progress(result, True)
+            try:
+                value = fn()
+                if isinstance(value, Future):
+                    value = value.result()
+            except Exception, e:
+                result.error = e
+                return result
+            result.completed += 1
+            if progress is not None:
+                progress(result, False)
+        if poll:
+            result.stage = 'done'
+            result.status = value
+        else:
+            result.stage = 'processed'
+        return result
+
+    def _wait_processed(self, job, poller, timeout):
+        """ waits for the status of a BatchJob's mailing to be terminal for the job's
+            submit/partial_process and returns it. raises DocmailException if the
+            mailing failed or was cancelled, or is not processed within timeout seconds
+        """
+        terminal = terminal_statuses(job.submit, job.partial_process)
+        status = poller.track(job.mailing.guid, terminal=terminal, timeout=timeout).result()
+        if matcher(FAILED_STATUSES)(status):
+            raise DocmailException(0, status, 'mailing %s' % job.mailing.guid)
+        return status
+
+class AsyncClient(Client):
+    """ a docmail client whose methods return a future.Future instead of blocking.
+        envelopes are built and replies parsed with the same suds bindings as
+        Client, but requests are sent by a non-blocking transport so that a
+        single process can keep many requests in flight, eg:
+        
+            futures = [client.get_process_status(guid) for guid in guids]
+            statuses = [f.result() for f in futures]
+    """
+    def __init__(self, username, password, source='', wsdl_url=None, **kwargs):
+        self.async_transport = kwargs.pop('async_transport', None)
+        self._owns_transport = self.async_transport is None
+        if self._owns_transport:
+            self.async_transport = AsyncHttpTransport()
+        Client.__init__(self, username, password, source, wsdl_url, **kwargs)
+    
+    def close(self):
+        """ closes the non-blocking transport (unless it was passed in), failing
+            any requests still in flight
+        """
+        if self._owns_transport:
+            self.async_transport.close()
+    
+    def _call(self, operation, args, handler):
+        future = Future()
+        try:
+            soapclient, binding, request = self._prepare(operation, args)
+            if self.options.nosend:
+                xml = suds.client.RequestContext(soapclient, binding, request.message)
+                future.set_result(handler(xml))
+                return future
+        except Exception:
+            future.set_exc_info()
+            return future
+        
+        def completed(reply, exception):
+            if exception is not None:
+                future.set_exception(exception)
+                return
+            try:
+                if reply.code in (202, 204):
+                    xml = None
+                elif reply.code >= 300:
+                    error = TransportError('HTTP Error %d' % reply.code,
+                                           reply.code, StringIO(reply.message))
+                    xml = soapclient.rejected(binding, error)
+                else:
+                    xml = soapclient.received(binding, reply)
+                future.set_result(handler(xml))
+            except Exception:
+                future.set_exc_info()
+        
+        try:
+            self.async_transport.submit(request, completed)
+        except Exception:
+            future.set_exc_info()
+        return future
@@ -0,0 +1,93 @@
+"""
+A minimal future for results of calls that complete in the background
+"""
+
+import logging
+import sys
+import threading
+
+log = logging.getLogger(__name__)
+
+class TimeoutError(Exception):
+    pass
+
+class Future(object):
+    """ the pending result of a docmail call. the result (or exception) is set
+        once by whoever performs the call; callers may block on result() or
+        register callbacks with add_done_callback()
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._done = False
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+
+    def done(self):
+        return self._done
+
+    def result(self, timeout=None):
+        """ returns the result, blocking for up to timeout seconds (forever if None).
+            re-raises the exception if the call failed
+        """
+        self.wait(timeout)
+        if self._exc_info:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+    def exception(self, timeout=None):
+        """ returns the exception raised by the call, or None """
+        self.wait(timeout)
+        if self._exc_info:
+            return self._exc_info[1]
+        return None
+
+    def wait(self, timeout=None):
+        self._condition.acquire()
+        try:
+            if not self._done:
+                self._condition.wait(timeout)
+            if not self._done:
+                raise TimeoutError()
+        finally:
+            self._condition.release()
+
+    def add_done_callback(self, fn):
+        """ calls fn(future) when the future completes (immediately if it already has) """
+        self._condition.acquire()
+        try:
+            if not self._done:
+                self._callbacks.append(fn)
+                return
+        finally:
+            self._condition.release()
+        fn(self)
+
+    def set_result(self, result):
+        self._complete(result, None)
+
+    def set_exception(self, exception, traceback=None):
+        self._complete(None, (type(exception), exception, traceback))
+
+    def set_exc_info(self, exc_info=None):
+        """ sets the exception from sys.exc_info() - keeps the original traceback """
+        self._complete(None, exc_info or sys.exc_info())
+
+    def _complete(self, result, exc_info):
+        self._condition.acquire()
+        try:
+            if self._done:
+                return
+            self._result = result
+            self._exc_info = exc_info
+            self._done = True
+            self._condition.notifyAll()
+            callbacks = self._callbacks
+            self._callbacks = []
+        finally:
+            self._condition.release()
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception:
+                log.exception('future callback failed')
@@ -0,0 +1,247 @@
+"""
+Polls get_process_status for many mailings at once, backing off adaptively
+and notifying callers when a mailing reaches a terminal status
+"""
+
+import heapq
+import logging
+import threading
+import time
+
+from docmail.future import Future
+
+log = logging.getLogger(__name__)
+
+# a status is terminal if it contains any of these (case insensitive). pass
+# terminal= to StatusPoller to match your account's workflow exactly
+TERMINAL_KEYWORDS = ('submitted', 'complete', 'error', 'cancel')
+
+# the status of a mailing once process_mailing(submit, partial_process) has
+# finished with it, by (submit, partial_process)
+PROCESSED_STATUSES = { (True, True): ('Mailing submitted',),
+                       (True, False): ('Mailing submitted',),
+                       (False, True): ('Partial processing complete',),
+                       (False, False): ('Processing complete',) }
+
+# the statuses of a mailing that failed or was cancelled, final in any mode
+FAILED_STATUSES = ('Error in processing', 'Cancelled')
+
+def is_terminal(status):
+    status = (status or '').lower()
+    for keyword in TERMINAL_KEYWORDS:
+        if keyword in status:
+            return True
+    return False
+
+def terminal_statuses(submit, partial_process):
+    """ returns the terminal statuses of a mailing processed with
+        process_mailing(submit, partial_process)
+    """
+    return PROCESSED_STATUSES[(bool(submit), bool(partial_process))] + FAILED_STATUSES
+
+def matcher(statuses):
+    """ returns a function status -> bool that matches any of statuses (ignoring case) """
+    statuses = set(status.lower() for status in statuses)
+    return lambda status: (status or '').strip().lower() in statuses
+
+class _Tracked(object):
+    def __init__(self, guid, future, interval, terminal, deadline):
+        self.guid = guid
+        self.future = future
+        self.status = None
+        self.interval = interval
+        self.terminal = terminal
+        self.deadline = deadline
+        self.errors = 0
+        self.polls = 0
+
+class StatusPoller(object):
+    def __init__(self, client, terminal=is_terminal, intervals=None, interval=5.0,
+                 max_interval=300.0, backoff=1.5, max_errors=5, timeout=None):
+        """ polls client.get_process_status for each tracked mailing on a single
+            background thread, in order of when each mailing is next due.
+            - terminal - a function status -> bool, or a collection of terminal statuses
+              (matched ignoring case)
+            - intervals - initial poll interval (seconds) by status, eg {'Processing': 30}.
+              interval is used for the first poll and for statuses not in intervals
+            - while a mailing's status is unchanged its interval is multiplied by
+              backoff, up to max_interval. it is reset when the status changes
+            - a mailing's future fails after max_errors consecutive failed polls, or
+              with a DocmailException if its status is not terminal within timeout
+              seconds of being tracked (None to poll until it is)
+            works with Client (polls are made one at a time) or AsyncClient (polls
+            for all due mailings are in flight at once)
+        """
+        if not callable(terminal):
+            terminal = matcher(terminal)
+        self.client = client
+        self.terminal = terminal
+        self.intervals = intervals or {}
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_errors = max_errors
+        self.timeout = timeout
+        self._tracked = {}
+        self._queue = []
+        self._seq = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def track(self, mailing_guid, callback=None, terminal=None, timeout=None):
+        """ starts polling the mailing. returns a Future that resolves to the
+            terminal status. callback(mailing_guid, status) is also called then.
+            terminal and timeout override the poller's for this mailing
+        """
+        if terminal is None:
+            terminal = self.terminal
+        elif not callable(terminal):
+            terminal = matcher(terminal)
+        if timeout is None:
+            timeout = self.timeout
+        deadline = timeout is not None and time.time() + timeout or None
+        self._condition.acquire()
+        try:
+            tracked = self._tracked.get(mailing_guid)
+            if tracked is None:
+                tracked = _Tracked(mailing_guid, Future(), self.interval, terminal, deadline)
+                self._tracked[mailing_guid] = tracked
+                self._schedule(tracked, 0)
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name='docmail-poller')
+                self._thread.setDaemon(True)
+                self._thread.start()
+        finally:
+            self._condition.release()
+        if callback is not None:
+            def done(future):
+                if future.exception() is None:
+                    callback(mailing_guid, future.result())
+            tracked.future.add_done_callback(done)
+        return tracked.future
+
+    def untrack(self, mailing_guid):
+        """ stops polling the mailing. its future is left unresolved """
+        self._condition.acquire()
+        try:
+            self._tracked.pop(mailing_guid, None)
+        finally:
+            self._condition.release()
+
+    def pending(self):
+        """ returns the guids of mailings still being polled """
+        self._condition.acquire()
+        try:
+            return self._tracked.keys()
+        finally:
+            self._condition.release()
+
+    def stop(self):
+        """ stops the polling thread. tracked mailings are kept and polling
+            resumes on the next call to track()
+        """
+        self._condition.acquire()
+        try:
+            self._stopped = True
+            self._thread = None
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+    def _schedule(self, tracked, delay):
+        # callers hold self._condition
+        self._seq += 1
+        heapq.heappush(self._queue, (time.time() + delay, self._seq, tracked))
+        self._condition.notify()
+
+    def _run(self):
+        while True:
+            due = []
+            self._condition.acquire()
+            try:
+                while not due:
+                    if self._stopped or threading.currentThread() is not self._thread:
+                        return
+                    now = time.time()
+                    while self._queue and self._queue[0][0] <= now:
+                        tracked = heapq.heappop(self._queue)[2]
+                        if self._tracked.get(tracked.guid) is tracked:
+                            due.append(tracked)
+                    if not due:
+                        if self._queue:
+                            self._condition.wait(max(self._queue[0][0] - now, 0.001))
+                        else:
+                            self._condition.wait()
+            finally:
+                self._condition.release()
+            for tracked in due:
+                self._poll(tracked)
+
+    def _poll(self, tracked):
+        tracked.polls += 1
+        try:
+            status = self.client.get_process_status(tracked.guid)
+        except Exception, e:
+            self._polled(tracked, None, e)
+            return
+        if isinstance(status, Future):
+            status.add_done_callback(lambda f: self._polled(tracked, *self._outcome(f)))
+        else:
+            self._polled(tracked, status, None)
+
+    def _outcome(self, future):
+        error = future.exception()
+        if error is not None:
+            return None, error
+        return future.result(), None
+
+    def _polled(self, tracked, status, error):
+        if error is not None:
+            tracked.errors += 1
+            log.debug('polling %s failed (%s): %s', tracked.guid, tracked.errors, error)
+            if tracked.errors >= self.max_errors:
+                self._finish(tracked)
+                tracked.future.set_exception(error)
+                return
+            tracked.interval = min(tracked.interval * self.backoff, self.max_interval)
+        else:
+            tracked.errors = 0
+            if tracked.terminal(status):
+                self._finish(tracked)
+                tracked.future.set_result(status)
+                return
+            if status == tracked.status:
+                tracked.interval = min(tracked.interval * self.backoff, self.max_interval)
+            else:
+                tracked.interval = self.intervals.get(status, self.interval)
+                tracked.status = status
+        delay = tracked.interval
+        if tracked.deadline is not None:
+            remaining = tracked.deadline - time.time()
+            if remaining <= 0:
+                self._finish(tracked)
+                tracked.future.set_exception(self._timeout(tracked))
+                return
+            delay = min(delay, remaining)
+        self._condition.acquire()
+        try:
+            if self._tracked.get(tracked.guid) is tracked:
+                self._schedule(tracked, delay)
+        finally:
+            self._condition.release()
+
+    def _timeout(self, tracked):
+        from docmail.client import DocmailException
+        return DocmailException(0, 'Timeout', 'mailing %s did not reach a terminal status '
+                                'after %d polls (last status: %s)'
+                                % (tracked.guid, tracked.polls, tracked.status))
+
+    def _finish(self, tracked):
+        self._condition.acquire()
+        try:
+            if self._tracked.get(tracked.guid) is tracked:
+                del self._tracked[tracked.guid]
+        finally:
+            self._condition.release()
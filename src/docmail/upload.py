@@ -0,0 +1,113 @@
+"""
+Streams template and mailing list files into the outgoing soap message as
+base64, a chunk at a time, so that large files are never held in memory
+"""
+
+import base64
+import os
+
+class Base64Stream(object):
+    """ the base64 encoding of a file, read in chunks. chunk_size is a multiple
+        of 3 so that the encoded chunks can simply be concatenated
+    """
+    chunk_size = 3 * 16384
+
+    def __init__(self, path=None, file=None, offset=None):
+        """ specify either path (the file is opened when needed) or an open file
+            object, which is read from offset (by default its current position)
+        """
+        self.path = path
+        self.file = file
+        self.offset = offset or 0
+        if file is not None and offset is None:
+            try:
+                self.offset = file.tell()
+            except (AttributeError, IOError):
+                pass
+
+    def size(self):
+        """ returns the number of (unencoded) bytes to be sent """
+        if self.path is not None:
+            return os.path.getsize(self.path)
+        try:
+            return os.fstat(self.file.fileno()).st_size - self.offset
+        except (AttributeError, IOError, OSError):
+            self.file.seek(0, 2)
+            size = self.file.tell() - self.offset
+            self.file.seek(self.offset)
+            return size
+
+    def encoded_size(self):
+        return 4 * ((self.size() + 2) // 3)
+
+    def chunks(self):
+        """ generates the encoded file, chunk by chunk """
+        if self.path is not None:
+            fp = open(self.path, 'rb')
+        else:
+            fp = self.file
+            try:
+                fp.seek(self.offset)
+            except (AttributeError, IOError):
+                pass
+        try:
+            while True:
+                data = fp.read(self.chunk_size)
+                if not data:
+                    break
+                yield base64.b64encode(data)
+        finally:
+            if self.path is not None:
+                fp.close()
+
+class StreamedMessage(object):
+    """ a file-like http request body made of prefix + base64 stream + suffix.
+        the body length is known up front, and the body can be rewound with
+        seek(0) so that a request can be retried
+    """
+    def __init__(self, prefix, stream, suffix):
+        self.prefix = prefix
+        self.stream = stream
+        self.suffix = suffix
+        self.length = len(prefix) + stream.encoded_size() + len(suffix)
+        self.seek(0)
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return '%s<%d bytes of base64 data>%s' % (self.prefix, self.stream.encoded_size(), self.suffix)
+
+    def _parts(self):
+        yield self.prefix
+        for chunk in self.stream.chunks():
+            yield chunk
+        yield self.suffix
+
+    def seek(self, offset, whence=0):
+        if offset != 0 or whence != 0:
+            raise IOError('StreamedMessage can only be rewound to the start')
+        self._iter = self._parts()
+        self._chunk = ''
+        self._pos = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            parts = [self._chunk[self._pos:]]
+            parts.extend(self._iter)
+            self._chunk, self._pos = '', 0
+            return ''.join(parts)
+        while self._pos >= len(self._chunk):
+            try:
+                self._chunk = self._iter.next()
+                self._pos = 0
+            except StopIteration:
+                return ''
+        data = self._chunk[self._pos:self._pos+size]
+        self._pos += len(data)
+        return data
+
+    def close(self):
+        self._iter = iter(())
+        self._chunk = ''
+        self._pos = 0
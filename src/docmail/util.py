@@ -1,3 +1,5 @@
+from xml.parsers import expat
+
 def split_caps(key):
     """ splits a string using capital letters as separator
         eg split_caps('ExampleString') returns ['Example', 'String']
@@ -17,4 +19,42 @@ def split_caps(key):
             b = False
             x = i-1
     lst.append(key[x:])
-    return lst
\ No newline at end of file
+    return lst
+
+def parse_records(xml):
+    """ parses docmail's key/value result xml in a single pass, eg:
+            <Root><Record><Key>Status</Key><Value>Processed</Value></Record>...</Root>
+        returns a list with one entry per record, each a list of the text of
+        the record's child elements - ie [[u'Status', u'Processed'], ...]
+    """
+    records = []
+    state = {'depth': 0, 'text': None}
+
+    def start(name, attrs):
+        depth = state['depth'] = state['depth'] + 1
+        if depth == 2:
+            records.append([])
+        elif depth == 3:
+            state['text'] = []
+
+    def end(name):
+        depth = state['depth']
+        state['depth'] = depth - 1
+        if depth == 3:
+            records[-1].append(u''.join(state['text']))
+            state['text'] = None
+
+    def characters(data):
+        text = state['text']
+        if text is not None:
+            text.append(data)
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = characters
+    if isinstance(xml, unicode):
+        xml = xml.encode('utf-8')
+    parser.Parse(xml, True)
+    return records
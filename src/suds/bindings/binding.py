@@ -21,7 +21,7 @@ Provides classes for (WS) SOAP bindings.
 from logging import getLogger
 from suds import *
 from suds.sax import Namespace
-from suds.sax.parser import Parser
+from suds.sax.parser import Parser, StreamHandler
 from suds.sax.document import Document
 from suds.sax.element import Element
 from suds.sudsobject import Factory, Object
@@ -30,16 +30,27 @@ from suds.mx.literal import Literal as MxLiteral
 from suds.umx.basic import Basic as UmxBasic
 from suds.umx.typed import Typed as UmxTyped
 from suds.bindings.multiref import MultiRef
+from suds.bindings import template
 from suds.xsd.query import TypeQuery, ElementQuery
 from suds.xsd.sxbasic import Element as SchemaElement
 from suds.options import Options
 from suds.plugin import PluginContainer
 from copy import deepcopy 
+from cStringIO import StringIO
+from threading import local
 
 log = getLogger(__name__)
 
 envns = ('SOAP-ENV', 'http://schemas.xmlsoap.org/soap/envelope/')
 
+# The size of the blocks read from a streamed reply.
+blocksize = 64 * 1024
+
+# The options of the client making a call on this thread.  Set by
+# L{suds.client.SoapClient} so that bindings, which are part of the
+# WSDL model shared by many clients, use the calling client's options.
+context = local()
+
 
 class Binding:
     """
@@ -63,13 +74,15 @@ class Binding:
         @type wsdl: L{wsdl.Definitions}
         """
         self.wsdl = wsdl
-        self.multiref = MultiRef()
         
     def schema(self):
         return self.wsdl.schema
     
     def options(self):
-        return self.wsdl.options
+        options = getattr(context, 'options', None)
+        if options is None:
+            return self.wsdl.options
+        return options
         
     def unmarshaller(self, typed=True):
         """
@@ -127,6 +140,41 @@ class Binding:
             env.refitPrefixes()
         return Document(env)
     
+    def get_template_message(self, method, args, kwargs):
+        """
+        Get the soap message for the specified method and args from the
+        method's precompiled L{template.Template}.  This is the same
+        message as built by L{get_message} but the per-call work is
+        escaping and joining the args.  The template is compiled on
+        first use and is not used when the message has soap headers or
+        may be changed by plugins.
+        @param method: The method being invoked.
+        @type method: I{service.Method}
+        @param args: A list of args for the method invoked.
+        @type args: list
+        @param kwargs: Named (keyword) args for the method invoked.
+        @type kwargs: dict
+        @return: The soap envelope, or None when the template can't be
+            used, in which case L{get_message} must be used.
+        @rtype: L{template.Envelope}
+        """
+        options = self.options()
+        if not options.templates or options.plugins \
+            or options.soapheaders or options.wsse is not None:
+                return None
+        key = (method.name, options.xstq, options.prefixes)
+        templates = self.__dict__.setdefault('templates', {})
+        if key in templates:
+            t = templates[key]
+        else:
+            t = templates[key] = template.compile(self, method)
+        if t is None:
+            return None
+        text = t.render(args, kwargs)
+        if text is None:
+            return None
+        return template.Envelope(text, options.parser)
+
     def get_reply(self, method, reply):
         """
         Process the I{reply} for the specified I{method} by sax parsing the I{reply}
@@ -141,7 +189,7 @@ class Binding:
         @rtype: tuple ( L{Element}, L{Object} )
         """
         reply = self.replyfilter(reply)
-        sax = Parser()
+        sax = Parser(self.options().parser)
         replyroot = sax.parse(string=reply)
         plugins = PluginContainer(self.options().plugins)
         plugins.message.parsed(reply=replyroot)
@@ -149,7 +197,7 @@ class Binding:
         soapenv.promotePrefixes()
         soapbody = soapenv.getChild('Body')
         self.detect_fault(soapbody)
-        soapbody = self.multiref.process(soapbody)
+        soapbody = MultiRef().process(soapbody)
         nodes = self.replycontent(method, soapbody)
         rtypes = self.returned_types(method)
         if len(rtypes) > 1:
@@ -176,6 +224,15 @@ class Binding:
         fault = body.getChild('Fault', envns)
         if fault is None:
             return
+        return self.webfault(fault)
+
+    def webfault(self, fault):
+        """
+        Unmarshal a soapenv:Fault element.
+        @param fault: The fault element.
+        @type fault: L{Element}
+        @raise WebFault: When I{faults} is True.
+        """
         unmarshaller = self.unmarshaller(False)
         p = unmarshaller.process(fault)
         if self.options().faults:
@@ -202,6 +259,102 @@ class Binding:
             result.append(sobject)
         return result
     
+    def streamable(self, method):
+        """
+        Get whether the reply to the specified I{method} can be streamed
+        by L{get_reply_stream}: the method returns a single I{list} type.
+        @param method: A service method.
+        @type method: I{service.Method}
+        @rtype: bool
+        """
+        rtypes = self.returned_types(method)
+        return ( len(rtypes) == 1 and rtypes[0].unbounded() )
+
+    def get_reply_stream(self, method, reply):
+        """
+        Process the I{reply} for the specified I{method} as it is parsed.
+        Unlike L{get_reply}, the reply is not parsed into a document;
+        each item of the returned list is unmarshalled as soon as it has
+        been parsed and is then discarded, so that memory use is bounded
+        by the size of an item rather than of the reply.  The reply is
+        not passed to the I{replyfilter} or to the I{parsed} plugins.
+        The method must be L{streamable}.
+        @param method: The name of the invoked method.
+        @type method: str
+        @param reply: The reply XML received after invoking the specified method.
+        @type reply: (str|I{file-like})
+        @return: A generator of the unmarshalled list items.  A fault
+            in the reply is raised as the generator is consumed.
+        @rtype: generator
+        """
+        if isinstance(reply, basestring):
+            reply = StringIO(reply)
+        rt = self.returned_types(method)[0]
+        depth = self.replydepth(method)
+        return self.replystream(rt, depth, reply, self.options())
+
+    def replystream(self, rt, depth, fp, options):
+        """
+        The generator returned by L{get_reply_stream}.  It runs while the
+        caller iterates, so the calling client's I{options} are set as the
+        binding L{context} only while a block of the reply is processed.
+        @param rt: The return I{type}.
+        @type rt: L{suds.xsd.sxbase.SchemaObject}
+        @param depth: The depth of the reply content nodes.
+        @type depth: int
+        @param fp: The reply.
+        @type fp: I{file-like}
+        @param options: The calling client's options.
+        @type options: L{Options}
+        """
+        handler = StreamHandler(depth)
+        parser = handler.parser()
+        resolved = rt.resolve(nobuiltin=True)
+        unmarshaller = self.unmarshaller()
+        data = True
+        try:
+            while data:
+                data = fp.read(blocksize)
+                saved = getattr(context, 'options', None)
+                context.options = options
+                try:
+                    parser.Parse(data, not data)
+                    result = []
+                    for node in handler.completed:
+                        if node.parent.match('Fault', envns):
+                            # part of a fault, detected in the body below
+                            node.parent.children.append(node)
+                            continue
+                        if node.match('Fault', envns):
+                            self.webfault(node)
+                            continue
+                        result.append(unmarshaller.process(node, resolved))
+                    del handler.completed[:]
+                    if not data:
+                        self.detect_fault(self.streambody(handler))
+                finally:
+                    context.options = saved
+                for sobject in result:
+                    yield sobject
+        finally:
+            fp.close()
+
+    def streambody(self, handler):
+        """
+        Get the soap body of a streamed reply.
+        @param handler: The handler that parsed the reply.
+        @type handler: L{StreamHandler}
+        @return: The soap body.
+        @rtype: L{Element}
+        """
+        soapenv = handler.nodes[0].getChild('Envelope')
+        if soapenv is None:
+            raise Exception('<Envelope/> not found in reply')
+        soapbody = soapenv.getChild('Body')
+        if soapbody is None:
+            raise Exception('<Body/> not found in reply')
+        return soapbody
+
     def replycomposite(self, rtypes, nodes):
         """
         Construct a I{composite} reply.  This method is called when it has been
@@ -254,7 +407,7 @@ class Binding:
         @rtype: tuple ( L{Element}, L{Object} )
         """
         reply = self.replyfilter(reply)
-        sax = Parser()
+        sax = Parser(self.options().parser)
         faultroot = sax.parse(string=reply)
         soapenv = faultroot.getChild('Envelope')
         soapbody = soapenv.getChild('Body')
@@ -402,6 +555,16 @@ class Binding:
         @rtype: [L{Element},...]
         """
         raise Exception, 'not implemented'
+
+    def replydepth(self, method):
+        """
+        Get the depth, in the reply document, of the nodes returned by
+        L{replycontent}.  The soap envelope has a depth of 1.
+        @param method: A service method.
+        @type method: I{service.Method}
+        @rtype: int
+        """
+        raise Exception, 'not implemented'
     
     def body(self, content):
         """
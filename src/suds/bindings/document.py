@@ -75,6 +75,13 @@ class Document(Binding):
             return body[0].children
         else:
             return body.children
+
+    def replydepth(self, method):
+        wrapped = method.soap.output.body.wrapped
+        if wrapped:
+            return 4
+        else:
+            return 3
         
     def document(self, wrapper):
         """
@@ -61,6 +61,9 @@ class RPC(Binding):
     
     def replycontent(self, method, body):
         return body[0].children
+
+    def replydepth(self, method):
+        return 4
         
     def method(self, method):
         """
@@ -86,6 +89,10 @@ class Encoded(RPC):
     def marshaller(self):
         return MxEncoded(self.schema())
 
+    def streamable(self, method):
+        # multiref references can only be resolved in the complete body
+        return False
+
     def unmarshaller(self, typed=True):
         """
         Get the appropriate XML decoder.
@@ -0,0 +1,237 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the (LGPL) GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 3 of the 
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Library Lesser General Public License for more details at
+# ( http://www.gnu.org/licenses/lgpl.html ).
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+# written by: Jeff Ortel ( jortel@redhat.com )
+
+"""
+Provides classes for building soap messages from precompiled templates.
+A L{Template} is compiled once per method from messages built by the
+binding, so it produces exactly the message the binding would build.
+"""
+
+from logging import getLogger
+from suds import *
+from suds.sax.parser import Parser
+from suds.sax.text import Text
+from uuid import uuid4
+
+log = getLogger(__name__)
+
+# The parameter values a template can render.  Other values (objects,
+# lists, dicts, L{Text} ..) are marshalled by the binding.
+primitives = (str, unicode, int, long, float, bool)
+
+
+class Envelope:
+    """
+    A soap envelope rendered from a L{Template}.  It is serialized
+    already and is only parsed if the document is needed, so that it
+    can be used in place of the L{Document} built by the binding.
+    @ivar text: The serialized envelope.
+    @type text: unicode
+    @ivar parser: The parser backend used to parse the envelope.
+    @type parser: str
+    """
+
+    def __init__(self, text, parser='sax'):
+        """
+        @param text: The serialized envelope.
+        @type text: unicode
+        @param parser: The parser backend used to parse the envelope.
+        @type parser: str
+        """
+        self.text = text
+        self.parser = parser
+        self.document = None
+
+    def doc(self):
+        """
+        Get the parsed envelope.
+        @rtype: L{Document}
+        """
+        if self.document is None:
+            sax = Parser(self.parser)
+            self.document = sax.parse(string=self.text.encode('utf-8'))
+        return self.document
+
+    def root(self):
+        return self.doc().root()
+
+    def str(self):
+        return self.doc().str()
+
+    def plain(self):
+        return self.text
+
+    def write(self, fp, pretty=False, encoding=None):
+        if pretty:
+            self.doc().write(fp, pretty, encoding)
+        elif encoding is None:
+            fp.write(self.text)
+        else:
+            fp.write(self.text.encode(encoding))
+
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+    def __unicode__(self):
+        return self.str()
+
+
+class Param:
+    """
+    A template parameter.
+    @ivar name: The parameter name.
+    @type name: str
+    @ivar resolved: The parameter's (builtin) XSD type.
+    @type resolved: L{suds.xsd.sxbase.SchemaObject}
+    @ivar open: The element start tag.
+    @type open: unicode
+    @ivar close: The element end tag.
+    @type close: unicode
+    @ivar none: The rendered element when the value is None.  The
+        parameter can't be rendered when None when this is None.
+    @type none: unicode
+    """
+
+    def __init__(self, name, resolved, open, close, none):
+        self.name = name
+        self.resolved = resolved
+        self.open = open
+        self.close = close
+        self.none = none
+
+    def render(self, value):
+        """
+        Render the parameter element as the marshaller does.
+        @param value: The parameter value.
+        @type value: any
+        @return: The element, or None when it can't be rendered.
+        @rtype: unicode
+        """
+        if value is None:
+            return self.none
+        if type(value) not in primitives:
+            return None
+        value = self.resolved.translate(value, False)
+        if value is None:
+            return self.none
+        text = Text(tostr(value)).escape()
+        return u''.join((self.open, text, self.close))
+
+
+class Template:
+    """
+    A precompiled soap message for a method.  The message is stored as
+    the fixed text between the parameter elements.
+    @ivar parts: The fixed text.  There is one more part than there
+        are parameters.
+    @type parts: [unicode,..]
+    @ivar params: The parameters.
+    @type params: [L{Param},..]
+    """
+
+    def __init__(self, parts, params):
+        """
+        @param parts: The fixed text.
+        @type parts: [unicode,..]
+        @param params: The parameters.
+        @type params: [L{Param},..]
+        """
+        self.parts = parts
+        self.params = params
+
+    def render(self, args, kwargs):
+        """
+        Render the soap message.  Arguments are matched to parameters as
+        is done by the binding.
+        @param args: A list of args for the method invoked.
+        @type args: list
+        @param kwargs: Named (keyword) args for the method invoked.
+        @type kwargs: dict
+        @return: The message, or None when an argument can't be rendered.
+        @rtype: unicode
+        """
+        result = [self.parts[0]]
+        n = 0
+        for param in self.params:
+            if n < len(args):
+                value = args[n]
+            else:
+                value = kwargs.get(param.name)
+            n += 1
+            try:
+                element = param.render(value)
+            except Exception, e:
+                log.debug('%s not rendered: %s', param.name, e)
+                return None
+            if element is None:
+                return None
+            result.append(element)
+            result.append(self.parts[n])
+        return u''.join(result)
+
+
+def compile(binding, method):
+    """
+    Compile the template for a method.  A message is built by the
+    binding with a unique marker for each parameter and the marker
+    elements become the parameters.  A message is also built with
+    each parameter None, to learn how None is rendered.
+    @param binding: The binding used to build the method's messages.
+    @type binding: L{suds.bindings.binding.Binding}
+    @param method: A service method.
+    @type method: I{service.Method}
+    @return: The template, or None when the method's parameters are
+        not all of builtin types.
+    @rtype: L{Template}
+    """
+    pdefs = binding.param_defs(method)
+    for pd in pdefs:
+        if not pd[1].resolve().builtin():
+            log.debug('%s(): %s not builtin, no template', method.name, pd[0])
+            return None
+    token = uuid4().hex
+    markers = ['suds%s%dx' % (token, n) for n in range(len(pdefs))]
+    text = binding.get_message(method, markers, {}).plain()
+    parts = []
+    params = []
+    pos = 0
+    for n, pd in enumerate(pdefs):
+        marker = markers[n]
+        i = text.find(marker)
+        if i < 0 or text.find(marker, i+1) >= 0:
+            log.debug('%s(): %s not found, no template', method.name, pd[0])
+            return None
+        start = text.rfind('<', pos, i)
+        end = text.find('>', i) + 1
+        open = text[start:i]
+        close = text[i+len(marker):end]
+        if start < 0 or '<' in open[1:] or not close.startswith('</'):
+            log.debug('%s(): %s not text, no template', method.name, pd[0])
+            return None
+        args = list(markers)
+        args[n] = None
+        alt = binding.get_message(method, args, {}).plain()
+        head, tail = text[:start], text[end:]
+        if alt.startswith(head) and alt.endswith(tail) \
+            and len(alt) >= len(head) + len(tail):
+                none = alt[len(head):len(alt)-len(tail)]
+        else:
+            none = None
+        parts.append(text[pos:start])
+        params.append(Param(pd[0], pd[1].resolve(), open, close, none))
+        pos = end
+    parts.append(text[pos:])
+    return Template(parts, params)
@@ -19,8 +19,15 @@ Contains basic caching classes.
 """
 
 import os
+import errno
+import mmap
+import struct
 import suds
-from tempfile import gettempdir as tmp
+import time
+import zlib
+from threading import Lock, local
+from collections import OrderedDict
+from tempfile import gettempdir as tmp, mkstemp
 from suds.transport import *
 from suds.sax.parser import Parser
 from suds.sax.element import Element
@@ -32,9 +39,18 @@ try:
     import cPickle as pickle
 except:
     import pickle
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
 
 log = getLogger(__name__)
 
+# the process umask, read once: os.umask() can only be read by setting it,
+# which is not safe while other threads create files.
+umask = os.umask(0)
+os.umask(umask)
+
 
 class Cache:
     """
@@ -95,6 +111,109 @@ class Cache:
         """
         raise Exception('not-implemented')
     
+    def lock(self, id):
+        """
+        Get a lock used to make sure that only one client (thread or
+        process) builds a missing object at a time, while the others
+        wait and then get it from the cache.  By default, no locking.
+        @param id: The object ID.
+        @type id: str
+        @return: A lock with acquire() and release().
+        @rtype: L{NoLock}
+        """
+        return NoLock()
+    
+    def touch(self, id):
+        """
+        Restart the cache duration of an object, eg: after it has been
+        revalidated.  By default, nothing is done.
+        @param id: The object ID.
+        @type id: str
+        """
+        pass
+
+
+class NoLock:
+    """
+    The passthru cache lock.
+    """
+    
+    def acquire(self):
+        return True
+    
+    def release(self):
+        pass
+
+
+class FileLock:
+    """
+    An inter-process lock held by creating a lock file (O_EXCL).
+    A lock file older than I{stale} seconds is assumed to have been
+    left by a process that died and is removed.  If the lock cannot
+    be acquired within I{timeout} seconds, the caller proceeds
+    without it.
+    @ivar path: The lock file path.
+    @type path: str
+    @ivar timeout: The max number of seconds to wait.
+    @type timeout: float
+    @ivar stale: The age (seconds) after which a lock file is stale.
+    @type stale: float
+    """
+    
+    interval = 0.05
+    
+    def __init__(self, path, timeout=60, stale=300):
+        """
+        @param path: The lock file path.
+        @type path: str
+        @param timeout: The max number of seconds to wait.
+        @type timeout: float
+        @param stale: The age (seconds) after which a lock file is stale.
+        @type stale: float
+        """
+        self.path = path
+        self.timeout = timeout
+        self.stale = stale
+        self.held = False
+    
+    def acquire(self):
+        """
+        Acquire the lock, waiting up to I{timeout} seconds.
+        @return: True when acquired.
+        @rtype: bool
+        """
+        deadline = time.time()+self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT|os.O_EXCL|os.O_WRONLY)
+                os.write(fd, str(os.getpid()))
+                os.close(fd)
+                self.held = True
+                return True
+            except OSError, e:
+                if e.errno != errno.EEXIST:
+                    log.debug(self.path, exc_info=1)
+                    return False
+            try:
+                if time.time()-os.path.getmtime(self.path) > self.stale:
+                    log.debug('%s stale, removed', self.path)
+                    os.remove(self.path)
+                    continue
+            except OSError:
+                continue
+            if time.time() > deadline:
+                log.debug('%s not acquired after %ss', self.path, self.timeout)
+                return False
+            time.sleep(self.interval)
+    
+    def release(self):
+        if self.held:
+            self.held = False
+            try:
+                os.remove(self.path)
+            except OSError:
+                log.debug(self.path, exc_info=1)
+    
 
 class NoCache(Cache):
     """
@@ -114,11 +233,564 @@ class NoCache(Cache):
         pass
 
 
+class ExpiringCache(Cache):
+    """
+    An object cache whose entries expire after a duration in seconds.
+    @cvar units: The duration units.
+    @type units: tuple
+    @ivar duration: The number of seconds entries are cached.
+        A duration=0 means forever.
+    @type duration: float
+    """
+    units = ('weeks', 'days', 'hours', 'minutes', 'seconds')
+    duration = 0
+
+    def setduration(self, **duration):
+        """
+        Set the (default) caching duration.
+        @param duration: The duration which defines how long entries
+            are cached.  A duration=0 means forever.
+            The duration may be: (weeks|days|hours|minutes|seconds).
+        @type duration: {unit:value}
+        """
+        if len(duration) == 1:
+            arg = duration.items()[0]
+            if not arg[0] in self.units:
+                raise Exception('must be: %s' % str(self.units))
+            td = timedelta(**dict((arg,)))
+            self.duration = td.days*86400 + td.seconds + td.microseconds/1e6
+        return self
+
+
+class MemoryCache(ExpiringCache):
+    """
+    An in-process (memory resident) object cache.
+    Cached objects are not copied: every client that uses the same
+    cache instance shares the same object.  With I{cachingpolicy} = B{1}
+    clients created for the same WSDL share the L{suds.wsdl.Definitions}
+    (as done by L{suds.client.Client.clone}) and nothing is unpickled.
+    The size of each entry is given when it is added or, when not
+    given, estimated once (see L{sizeof}).  When the total size
+    exceeds I{maxsize} the least recently used entries are evicted.
+    @ivar maxsize: The max total size (bytes) of the cached entries.
+    @type maxsize: int
+    @ivar duration: The default duration (seconds) that entries are
+        cached for.  A duration=0 means forever.
+    @type duration: float
+    @ivar size: The current total size (bytes) of the cached entries.
+    @type size: int
+    @ivar entries: The entries as {id:(object, size, expires, duration)}
+        in least recently used order.
+    @type entries: I{OrderedDict}
+    @cvar nodesize: The size (bytes) charged for each XML element,
+        besides its name, text and attributes.
+    @type nodesize: int
+    """
+    nodesize = 100
+
+    def __init__(self, maxsize=32*1024*1024, **duration):
+        """
+        @param maxsize: The max total size (bytes) of the cached entries.
+        @type maxsize: int
+        @param duration: The default duration which defines how long
+            entries are cached.  A duration=0 means forever.
+            The duration may be: (weeks|days|hours|minutes|seconds).
+        @type duration: {unit:value}
+        """
+        self.maxsize = maxsize
+        self.duration = 0
+        self.setduration(**duration)
+        self.size = 0
+        self.entries = OrderedDict()
+        self.mutex = Lock()
+
+    def sizeof(self, object):
+        """
+        Get the size (bytes) charged for an object: the length of a
+        string.  XML documents (L{Element}) and objects built from one
+        (eg: L{suds.wsdl.Definitions}, by its I{root}) are estimated by
+        walking the elements, without serializing them.  Other objects
+        are pickled to be measured, so callers that know the size
+        should pass it to L{put}.
+        @param object: The object.
+        @type object: any
+        @rtype: int
+        """
+        if isinstance(object, basestring):
+            return len(object)
+        if not isinstance(object, Element):
+            root = getattr(object, 'root', None)
+            if isinstance(root, Element):
+                object = root
+        if isinstance(object, Element):
+            return self.estimate(object)
+        try:
+            return len(pickle.dumps(object, 2))
+        except:
+            log.debug('size of %r unknown', object, exc_info=1)
+            return 0
+
+    def estimate(self, root):
+        """
+        Estimate the size (bytes) of an XML tree.
+        @param root: The root element.
+        @type root: L{Element}
+        @rtype: int
+        """
+        size = 0
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            size += self.nodesize + len(node.name) + len(node.text or '')
+            for a in node.attributes:
+                size += len(a.name) + len(a.value or '')
+            stack.extend(node.children)
+        return size
+
+    def get(self, id):
+        self.mutex.acquire()
+        try:
+            entry = self.entries.pop(id, None)
+            if entry is None:
+                return None
+            if entry[2] and entry[2] < time.time():
+                log.debug('%s expired, deleted', id)
+                self.size -= entry[1]
+                return None
+            self.entries[id] = entry
+            return entry[0]
+        finally:
+            self.mutex.release()
+
+    def getf(self, id):
+        object = self.get(id)
+        if object is None:
+            return None
+        return StringIO(object)
+
+    def put(self, id, object, duration=None, size=None):
+        """
+        Put a object into the cache.
+        @param id: The object ID.
+        @type id: str
+        @param object: The object to add.
+        @type object: any
+        @param duration: The number of seconds to cache the object for,
+            overriding the cache I{duration}.  A duration=0 means forever.
+        @type duration: float
+        @param size: The size (bytes) charged for the object, when known
+            by the caller.  Otherwise, see L{sizeof}.
+        @type size: int
+        """
+        if size is None:
+            size = self.sizeof(object)
+        if size > self.maxsize:
+            log.debug('%s (%d bytes) too large to cache', id, size)
+            self.purge(id)
+            return object
+        if duration is None:
+            duration = self.duration
+        expires = duration and time.time()+duration or 0
+        self.mutex.acquire()
+        try:
+            prev = self.entries.pop(id, None)
+            if prev is not None:
+                self.size -= prev[1]
+            self.entries[id] = (object, size, expires, duration)
+            self.size += size
+            while self.size > self.maxsize:
+                evicted, entry = self.entries.popitem(last=False)
+                self.size -= entry[1]
+                log.debug('%s evicted', evicted)
+        finally:
+            self.mutex.release()
+        return object
+
+    def putf(self, id, fp):
+        bfr = fp.read()
+        fp.close()
+        self.put(id, bfr)
+        return StringIO(bfr)
+
+    def touch(self, id):
+        self.mutex.acquire()
+        try:
+            entry = self.entries.get(id)
+            if entry is not None and entry[2]:
+                expires = time.time()+entry[3]
+                self.entries[id] = entry[:2]+(expires, entry[3])
+        finally:
+            self.mutex.release()
+
+    def purge(self, id):
+        self.mutex.acquire()
+        try:
+            entry = self.entries.pop(id, None)
+            if entry is not None:
+                self.size -= entry[1]
+        finally:
+            self.mutex.release()
+
+    def clear(self):
+        self.mutex.acquire()
+        try:
+            self.entries = OrderedDict()
+            self.size = 0
+        finally:
+            self.mutex.release()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class RemoteCache(Cache):
+    """
+    An object cache backed by a shared (remote) cache service such as
+    memcached, through a client that has the I{memcache} interface:
+    get(key), set(key, value, time), delete(key) and flush_all().
+    The client is expected to pickle values itself.  Failures of the
+    service are logged and treated as cache misses.
+    @ivar client: The cache service client.
+    @type client: I{memcache.Client}
+    @ivar duration: The number of seconds entries are cached.
+        A duration=0 means until evicted by the service.
+    @type duration: int
+    @ivar prefix: The key prefix.  Includes the suds version so that
+        objects pickled by other versions of suds are never used.
+    @type prefix: str
+    """
+
+    def __init__(self, client, duration=3600, prefix=None):
+        """
+        @param client: The cache service client.
+        @type client: I{memcache.Client}
+        @param duration: The number of seconds entries are cached.
+        @type duration: int
+        @param prefix: The key prefix.
+        @type prefix: str
+        """
+        self.client = client
+        self.duration = duration
+        if prefix is None:
+            prefix = 'suds-%s:' % suds.__version__
+        self.prefix = prefix
+
+    def key(self, id):
+        return '%s%s' % (self.prefix, id)
+
+    def get(self, id):
+        try:
+            return self.client.get(self.key(id))
+        except:
+            log.debug(id, exc_info=1)
+
+    def getf(self, id):
+        bfr = self.get(id)
+        if bfr is None:
+            return None
+        return StringIO(bfr)
+
+    def put(self, id, object):
+        try:
+            self.client.set(self.key(id), object, self.duration)
+        except:
+            log.debug(id, exc_info=1)
+        return object
+
+    def putf(self, id, fp):
+        bfr = fp.read()
+        fp.close()
+        self.put(id, bfr)
+        return StringIO(bfr)
+
+    def touch(self, id):
+        touch = getattr(self.client, 'touch', None)
+        if touch is None:
+            return
+        try:
+            touch(self.key(id), self.duration)
+        except:
+            log.debug(id, exc_info=1)
+
+    def purge(self, id):
+        try:
+            self.client.delete(self.key(id))
+        except:
+            log.debug(id, exc_info=1)
+
+    def clear(self):
+        self.client.flush_all()
+
+
+class TieredCache(Cache):
+    """
+    An object cache composed of other caches (tiers), fastest first,
+    eg: memory, local disk then a shared service:
+        TieredCache(MemoryCache(), ObjectCache(days=1), RemoteCache(mc))
+    Lookups try each tier in order.  When an object is found, it is
+    promoted: put into each of the (faster) tiers that missed.  Puts
+    and purges are applied to all tiers.  An error in one tier is
+    logged and does not affect the others.
+    @ivar tiers: The caches, fastest first.
+    @type tiers: [L{Cache},..]
+    """
+
+    def __init__(self, *tiers):
+        """
+        @param tiers: The caches, fastest first.
+        @type tiers: [L{Cache},..]
+        """
+        self.tiers = list(tiers)
+
+    def get(self, id):
+        for n, tier in enumerate(self.tiers):
+            try:
+                object = tier.get(id)
+            except:
+                log.debug(id, exc_info=1)
+                continue
+            if object is None:
+                continue
+            for upper in self.tiers[:n]:
+                self.__apply(upper.put, id, object)
+            return object
+        return None
+
+    def getf(self, id):
+        for n, tier in enumerate(self.tiers):
+            try:
+                fp = tier.getf(id)
+            except:
+                log.debug(id, exc_info=1)
+                continue
+            if fp is None:
+                continue
+            bfr = fp.read()
+            fp.close()
+            for upper in self.tiers[:n]:
+                self.__apply(upper.putf, id, StringIO(bfr))
+            return StringIO(bfr)
+        return None
+
+    def put(self, id, object):
+        for tier in self.tiers:
+            self.__apply(tier.put, id, object)
+        return object
+
+    def putf(self, id, fp):
+        bfr = fp.read()
+        fp.close()
+        for tier in self.tiers:
+            self.__apply(tier.putf, id, StringIO(bfr))
+        return StringIO(bfr)
+
+    def touch(self, id):
+        for tier in self.tiers:
+            self.__apply(tier.touch, id)
+
+    def purge(self, id):
+        for tier in self.tiers:
+            self.__apply(tier.purge, id)
+
+    def clear(self):
+        for tier in self.tiers:
+            self.__apply(tier.clear)
+
+    def lock(self, id):
+        return TieredLock([t.lock(id) for t in self.tiers])
+
+    def __apply(self, fn, *args):
+        try:
+            fn(*args)
+        except:
+            log.debug(fn, exc_info=1)
+
+
+class TieredLock:
+    """
+    The locks of each tier of a L{TieredCache}, acquired in order.
+    @ivar locks: The tier locks.
+    @type locks: list
+    """
+
+    def __init__(self, locks):
+        self.locks = locks
+
+    def acquire(self):
+        for lock in self.locks:
+            lock.acquire()
+        return True
+
+    def release(self):
+        for lock in reversed(self.locks):
+            lock.release()
+
+
+class SqliteCache(ExpiringCache):
+    """
+    An object cache stored in a single SQLite database file, safe to
+    share between threads and processes.  The database is used in WAL
+    mode so readers never block the writer.  Each put is a single
+    (atomic) I{INSERT OR REPLACE}, expiry times are indexed, and
+    expired entries are deleted in bulk by L{purgeexpired}, which is
+    also run every I{purgeinterval} puts.
+    Strings are stored as-is, XML documents (L{Element}) as XML text
+    which is parsed on get, and other objects are pickled, so the
+    cache may be used with either I{cachingpolicy}.
+    @ivar location: The path to the database file.
+    @type location: str
+    @ivar duration: The number of seconds entries are cached.
+        A duration=0 means forever.
+    @type duration: float
+    """
+    protocol = 2
+    purgeinterval = 100
+    
+    def __init__(self, location=None, **duration):
+        """
+        @param location: The path to the database file.
+        @type location: str
+        @param duration: The duration which defines how long entries
+            are cached.  A duration=0 means forever.
+            The duration may be: (weeks|days|hours|minutes|seconds).
+        @type duration: {unit:value}
+        """
+        if sqlite3 is None:
+            raise Exception('sqlite3 not available')
+        if location is None:
+            location = os.path.join(tmp(), 'suds', 'cache.db')
+        self.location = location
+        self.duration = 0
+        self.setduration(**duration)
+        self.local = local()
+        self.puts = 0
+        self.checkversion()
+    
+    def connection(self):
+        """
+        Get the database connection for the current thread, opening it
+        (and creating the database) if needed.  Connections are never
+        shared with a forked child process.
+        @rtype: I{sqlite3.Connection}
+        """
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None and self.local.pid == os.getpid():
+            return conn
+        dir = os.path.dirname(self.location)
+        if dir and not os.path.isdir(dir):
+            try:
+                os.makedirs(dir)
+            except OSError:
+                log.debug(dir, exc_info=1)
+        conn = sqlite3.connect(self.location, timeout=30, isolation_level=None)
+        conn.text_factory = str
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS cache '
+                     '(id TEXT PRIMARY KEY, kind TEXT, expires REAL, data BLOB)')
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        self.local.conn = conn
+        self.local.pid = os.getpid()
+        return conn
+    
+    def checkversion(self):
+        conn = self.connection()
+        row = conn.execute("SELECT value FROM meta WHERE name='version'").fetchone()
+        if row is None or row[0] != suds.__version__:
+            self.clear()
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)",
+                         (suds.__version__,))
+    
+    def get(self, id):
+        try:
+            row = self.connection().execute(
+                'SELECT kind, data FROM cache WHERE id=? AND (expires=0 OR expires>?)',
+                (id, time.time())).fetchone()
+            if row is None:
+                return None
+            kind, data = row[0], str(row[1])
+            if kind == 'xml':
+                return Parser().parse(string=data)
+            if kind == 'pickle':
+                return pickle.loads(data)
+            return data
+        except:
+            log.debug(id, exc_info=1)
+            self.purge(id)
+    
+    def getf(self, id):
+        bfr = self.get(id)
+        if not isinstance(bfr, basestring):
+            return None
+        return StringIO(bfr)
+    
+    def put(self, id, object):
+        try:
+            if isinstance(object, basestring):
+                kind, data = 'str', object
+            elif isinstance(object, Element):
+                kind, data = 'xml', str(object)
+            else:
+                kind, data = 'pickle', pickle.dumps(object, self.protocol)
+            expires = self.duration and time.time()+self.duration or 0
+            self.connection().execute(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                (id, kind, expires, sqlite3.Binary(data)))
+            self.puts += 1
+            if self.puts % self.purgeinterval == 0:
+                self.purgeexpired()
+        except:
+            log.debug(id, exc_info=1)
+        return object
+    
+    def putf(self, id, fp):
+        bfr = fp.read()
+        fp.close()
+        self.put(id, bfr)
+        return StringIO(bfr)
+    
+    def touch(self, id):
+        if not self.duration:
+            return
+        try:
+            self.connection().execute(
+                'UPDATE cache SET expires=? WHERE id=? AND expires>0',
+                (time.time()+self.duration, id))
+        except:
+            log.debug(id, exc_info=1)
+    
+    def purge(self, id):
+        try:
+            self.connection().execute('DELETE FROM cache WHERE id=?', (id,))
+        except:
+            log.debug(id, exc_info=1)
+    
+    def purgeexpired(self):
+        """
+        Delete all expired entries.
+        @return: The number of entries deleted.
+        @rtype: int
+        """
+        cursor = self.connection().execute(
+            'DELETE FROM cache WHERE expires>0 AND expires<=?', (time.time(),))
+        log.debug('%d expired entries deleted', cursor.rowcount)
+        return cursor.rowcount
+    
+    def clear(self):
+        self.connection().execute('DELETE FROM cache')
+
+
 class FileCache(Cache):
     """
     A file-based URL cache.
     @cvar fnprefix: The file name prefix.
     @type fnsuffix: str
+    @cvar tmpprefix: The temporary file name prefix used by L{write}.
+    @type tmpprefix: str
+    @cvar tmpage: The age (seconds) after which a temporary file is
+        taken to be orphaned by an interrupted L{write}, and deleted.
+    @type tmpage: int
     @ivar duration: The cached file duration which defines how
         long the file will be cached.
     @type duration: (unit, value)
@@ -126,6 +798,8 @@ class FileCache(Cache):
     @type location: str
     """
     fnprefix = 'suds'
+    tmpprefix = '.tmp-'
+    tmpage = 3600
     units = ('months', 'weeks', 'days', 'hours', 'minutes', 'seconds')
     
     def __init__(self, location=None, **duration):
@@ -190,9 +864,7 @@ class FileCache(Cache):
     def put(self, id, bfr):
         try:
             fn = self.__fn(id)
-            f = self.open(fn, 'w')
-            f.write(bfr)
-            f.close()
+            self.write(fn, bfr)
             return bfr
         except:
             log.debug(id, exc_info=1)
@@ -201,14 +873,53 @@ class FileCache(Cache):
     def putf(self, id, fp):
         try:
             fn = self.__fn(id)
-            f = self.open(fn, 'w')
-            f.write(fp.read())
+            self.write(fn, fp.read())
             fp.close()
-            f.close()
             return open(fn)
         except:
             log.debug(id, exc_info=1)
             return fp
+    
+    def write(self, fn, bfr):
+        """
+        Write the cache file atomically: the content is written to a
+        temporary file in the same directory which is then renamed, so
+        that readers see either the old file or the complete new one.
+        The temporary file is created private (0600), so it is given the
+        mode a file created by open() would have before it is renamed.
+        @param fn: The file name.
+        @type fn: str
+        @param bfr: The content.
+        @type bfr: str
+        """
+        self.mktmp()
+        fd, tmpfn = mkstemp(prefix=self.tmpprefix, dir=self.location)
+        try:
+            f = os.fdopen(fd, 'wb')
+            try:
+                f.write(bfr)
+            finally:
+                f.close()
+            os.chmod(tmpfn, 0666 & ~umask)
+            if os.name == 'nt' and os.path.exists(fn):
+                os.remove(fn)
+            os.rename(tmpfn, fn)
+        except:
+            try:
+                os.remove(tmpfn)
+            except OSError:
+                pass
+            raise
+    
+    def lock(self, id):
+        self.mktmp()
+        return FileLock(self.__fn(id)+'.lock')
+    
+    def touch(self, id):
+        try:
+            os.utime(self.__fn(id), None)
+        except OSError:
+            log.debug(id, exc_info=1)
         
     def get(self, id):
         try:
@@ -230,12 +941,13 @@ class FileCache(Cache):
     def validate(self, fn):
         """
         Validate that the file has not expired based on the I{duration}.
+        The duration starts when the file is written or L{touch}ed.
         @param fn: The file name.
         @type fn: str
         """
         if self.duration[1] < 1:
             return
-        created = dt.fromtimestamp(os.path.getctime(fn))
+        created = dt.fromtimestamp(os.path.getmtime(fn))
         d = { self.duration[0]:self.duration[1] }
         expired = created+timedelta(**d)
         if expired < dt.now():
@@ -247,9 +959,10 @@ class FileCache(Cache):
             path = os.path.join(self.location, fn)
             if os.path.isdir(path):
                 continue
-            if fn.startswith(self.fnprefix):
+            if fn.startswith(self.fnprefix) and not fn.endswith('.lock'):
                 os.remove(path)
                 log.debug('deleted: %s', path)
+        self.sweep()
                 
     def purge(self, id):
         fn = self.__fn(id)
@@ -257,6 +970,29 @@ class FileCache(Cache):
             os.remove(fn)
         except:
             pass
+        self.sweep()
+
+    def sweep(self):
+        """
+        Delete the temporary files left behind by an interrupted L{write}.
+        Only files older than I{tmpage} are deleted, so that writes in
+        progress (in this or another process) are not affected.
+        """
+        try:
+            names = os.listdir(self.location)
+        except OSError:
+            return
+        stale = time.time() - self.tmpage
+        for fn in names:
+            if not fn.startswith(self.tmpprefix):
+                continue
+            path = os.path.join(self.location, fn)
+            try:
+                if os.path.getmtime(path) < stale:
+                    os.remove(path)
+                    log.debug('deleted: %s', path)
+            except OSError:
+                pass
                 
     def open(self, fn, *args):
         """
@@ -276,9 +1012,7 @@ class FileCache(Cache):
                 raise Exception()
         except:
             self.clear()
-            f = self.open(path, 'w')
-            f.write(suds.__version__)
-            f.close()        
+            self.write(path, suds.__version__)
     
     def __fn(self, id):
         name = id
@@ -336,3 +1070,104 @@ class ObjectCache(FileCache):
         bfr = pickle.dumps(object, self.protocol)
         FileCache.put(self, id, bfr)
         return object
+
+
+class MappedObjectCache(ObjectCache):
+    """
+    Provides pickled object caching in a format that is loaded from a
+    memory-mapped file, so that processes on the same host loading the
+    same (large) definitions share the page cache pages, and no file
+    reads are made while unpickling.  Each file is a fixed size header
+    followed by the pickle.  The header contains a magic number, the
+    format version, the pickle length and crc32, and its own crc32.
+    Truncated, corrupt or foreign entries are detected from the header
+    and the file size alone, before the pickle is mapped, and purged.
+    The pickle crc32 is only checked the first time this cache loads
+    a file, so later gets do not read the payload twice.
+    @cvar magic: The file magic number.
+    @type magic: str
+    @cvar version: The file format version.
+    @type version: int
+    @cvar header: The header layout (excluding the header crc32).
+    @type header: I{struct.Struct}
+    @cvar verify: Verify the pickle crc32 on the first load of a file.
+    @type verify: bool
+    @ivar verified: The (inode, size, mtime) of files whose pickle
+        crc32 has been verified, by path.
+    @type verified: dict
+    """
+    magic = 'sudsmpx\0'
+    version = 1
+    header = struct.Struct('<8sHHQI')
+    hcrc = struct.Struct('<I')
+    verify = True
+    
+    def __init__(self, location=None, **duration):
+        """
+        @param location: The directory for the cached files.
+        @type location: str
+        @param duration: The cached file duration which defines how
+            long the file will be cached.  A duration=0 means forever.
+            The duration may be: (months|weeks|days|hours|minutes|seconds).
+        @type duration: {unit:value}
+        """
+        ObjectCache.__init__(self, location, **duration)
+        self.verified = {}
+    
+    def fnsuffix(self):
+        return 'mpx'
+    
+    def get(self, id):
+        try:
+            fp = FileCache.getf(self, id)
+            if fp is None:
+                return None
+            try:
+                return self.load(fp)
+            finally:
+                fp.close()
+        except:
+            log.debug(id, exc_info=1)
+            FileCache.purge(self, id)
+    
+    def load(self, fp):
+        """
+        Load the object from an open cache file.
+        @param fp: The cache file.
+        @type fp: file
+        @return: The unpickled object.
+        @raise Exception: When the file is truncated or corrupt.
+        """
+        hsize = self.header.size+self.hcrc.size
+        bfr = fp.read(hsize)
+        if len(bfr) != hsize:
+            raise Exception('truncated header')
+        hcrc = self.hcrc.unpack(bfr[self.header.size:])[0]
+        if zlib.crc32(bfr[:self.header.size]) & 0xffffffff != hcrc:
+            raise Exception('corrupt header')
+        magic, version, flags, length, crc = \
+            self.header.unpack(bfr[:self.header.size])
+        if magic != self.magic or version != self.version:
+            raise Exception('unknown format')
+        st = os.fstat(fp.fileno())
+        if st.st_size != hsize+length:
+            raise Exception('truncated')
+        mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            stamp = (st.st_ino, st.st_size, st.st_mtime)
+            if self.verify and self.verified.get(fp.name) != stamp:
+                if zlib.crc32(buffer(mm, hsize)) & 0xffffffff != crc:
+                    raise Exception('corrupt')
+                self.verified[fp.name] = stamp
+            # a single copy out of the mapping, then unpickled in memory
+            return pickle.loads(mm[hsize:])
+        finally:
+            mm.close()
+    
+    def put(self, id, object):
+        payload = pickle.dumps(object, self.protocol)
+        header = self.header.pack(self.magic, self.version, 0,
+            len(payload), zlib.crc32(payload) & 0xffffffff)
+        hcrc = self.hcrc.pack(zlib.crc32(header) & 0xffffffff)
+        FileCache.put(self, id, ''.join((header, hcrc, payload)))
+        return object
@@ -20,9 +20,11 @@ See I{README.txt}
 """
 
 from cookielib import CookieJar
+from cStringIO import StringIO
 from copy import deepcopy
 from logging import getLogger
 from suds import *
+from suds.bindings.binding import context as bindingcontext
 from suds.builder import Builder
 from suds.cache import ObjectCache, NoCache
 from suds.options import Options
@@ -33,10 +35,12 @@ from suds.resolver import PathResolver
 from suds.sax.document import Document
 from suds.sax.parser import Parser
 from suds.servicedefinition import ServiceDefinition
+from suds.snapshot import Snapshot, SnapshotError
 from suds.transport import TransportError, Request
 from suds.transport.https import HttpAuthenticated
 from suds.wsdl import Definitions
 from sudsobject import Factory as InstFactory, Object
+from threading import local
 from urlparse import urlparse
 import suds
 import suds.metrics as metrics
@@ -44,6 +48,28 @@ import suds.metrics as metrics
 log = getLogger(__name__)
 
 
+class Messages(local):
+    """
+    The last sent/received I{soap} messages.  Each thread sees only the
+    messages of the calls it made, so that a client may be shared by
+    many threads.
+    @ivar tx: The last sent message.
+    @type tx: L{Document}
+    @ivar rx: The last received message.
+    @type rx: L{Document}
+    """
+
+    def __init__(self):
+        self.tx = None
+        self.rx = None
+
+    def get(self, key):
+        return getattr(self, key, None)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+
 class Client(object):
     """ 
     A lightweight web services client.
@@ -56,8 +82,14 @@ class Client(object):
     @type factory: L{Factory}
     @ivar sd: The service definition
     @type sd: L{ServiceDefinition}
-    @ivar messages: The last sent/received messages.
-    @type messages: str[2]
+    @ivar messages: The last sent/received messages (by thread).
+    @type messages: L{Messages}
+    Thread safety: once created, a client may be shared by many threads,
+    provided its options are not changed while calls are in progress
+    (use a L{view} per thread or user for different options).  State
+    used by a call is local to the call: the binding options, multiref
+    resolution and the last sent/received messages (per thread).  Use
+    a transport that is safe to share, eg: L{suds.transport.pool.HttpPooled}.
     """
     @classmethod
     def items(cls, sobject):
@@ -106,17 +138,36 @@ class Client(object):
         self.options = options
         options.cache = ObjectCache(days=1)
         self.set_options(**kwargs)
-        reader = DefinitionsReader(options, Definitions)
-        self.wsdl = reader.open(url)
+        self.wsdl, self.sd = self.load(url)
         plugins = PluginContainer(options.plugins)
         plugins.init.initialized(wsdl=self.wsdl)
         self.factory = Factory(self.wsdl)
         self.service = ServiceSelector(self, self.wsdl.services)
-        self.sd = []
-        for s in self.wsdl.services:
-            sd = ServiceDefinition(self.wsdl, s)
-            self.sd.append(sd)
-        self.messages = dict(tx=None, rx=None)
+        self.messages = Messages()
+
+    def load(self, url):
+        """
+        Load the WSDL and build the service definitions.  When the
+        I{snapshot} option is set and the snapshot is usable, both are
+        loaded from the snapshot instead.
+        @param url: The URL for the WSDL.
+        @type url: str
+        @return: (wsdl, sd)
+        @rtype: (L{Definitions}, [L{ServiceDefinition},..])
+        """
+        options = self.options
+        if options.snapshot is not None:
+            try:
+                snapshot = Snapshot(options.snapshot)
+                return snapshot.load(url, options, options.snapshotcheck)
+            except SnapshotError, e:
+                log.warn('snapshot not used: %s', e)
+        reader = DefinitionsReader(options, Definitions)
+        wsdl = reader.open(url)
+        sd = []
+        for s in wsdl.services:
+            sd.append(ServiceDefinition(wsdl, s))
+        return (wsdl, sd)
         
     def set_options(self, **kwargs):
         """
@@ -162,6 +213,35 @@ class Client(object):
         """
         return self.messages.get('rx')
     
+    def view(self, **kwargs):
+        """
+        Get a lightweight view of this client.  The view shares the
+        WSDL model (I{wsdl}, I{factory} and I{sd}), which is not
+        modified by calls.  The option values are copied (shallow), so
+        the view's options may be set without affecting this client.
+        Unless one is specified, the view gets a copy of the transport,
+        which for L{suds.transport.pool.HttpPooled} shares its pooled
+        connections.  Nothing is built from the WSDL, so
+        creating a view is cheap, eg: a view per user account.
+        @param kwargs: Options to set on the view.
+        @see: L{Options}
+        @return: A view of this client.
+        @rtype: L{Client}
+        """
+        view = object.__new__(self.__class__)
+        view.__dict__.update(self.__dict__)
+        view.options = Options()
+        values = dict(Unskin(self.options).defined)
+        if 'transport' not in kwargs and values.get('transport') is not None:
+            # transport options are linked to the client options, so the
+            # view gets a copy (which shares any connection pool)
+            values['transport'] = deepcopy(values['transport'])
+        values.update(kwargs)
+        Unskin(view.options).update(values)
+        view.service = ServiceSelector(view, self.wsdl.services)
+        view.messages = Messages()
+        return view
+    
     def clone(self):
         """
         Get a shallow clone of this object.
@@ -182,7 +262,7 @@ class Client(object):
         clone.factory = self.factory
         clone.service = ServiceSelector(clone, self.wsdl.services)
         clone.sd = self.sd
-        clone.messages = dict(tx=None, rx=None)
+        clone.messages = Messages()
         return clone
  
     def __str__(self):
@@ -590,7 +670,9 @@ class SoapClient:
         timer.start()
         result = None
         binding = self.method.binding.input
-        soapenv = binding.get_message(self.method, args, kwargs)
+        soapenv = self.bound(binding.get_template_message, self.method, args, kwargs)
+        if soapenv is None:
+            soapenv = self.bound(binding.get_message, self.method, args, kwargs)
         timer.stop()
         metrics.log.debug(
                 "message for '%s' created: %s",
@@ -617,44 +699,113 @@ class SoapClient:
         location = self.location()
         binding = self.method.binding.input
         transport = self.options.transport
-        retxml = self.options.retxml
         nosend = self.options.nosend
-        prettyxml = self.options.prettyxml
         timer = metrics.Timer()
         log.debug('sending to (%s)\nmessage:\n%s', location, soapenv)
         try:
-            self.last_sent(soapenv)
-            plugins = PluginContainer(self.options.plugins)
-            plugins.message.marshalled(envelope=soapenv.root())
-            if prettyxml:
-                soapenv = soapenv.str()
-            else:
-                soapenv = soapenv.plain()
-            soapenv = soapenv.encode('utf-8')
-            ctx = plugins.message.sending(envelope=soapenv)
-            soapenv = ctx.envelope
+            request = self.request(soapenv)
             if nosend:
-                return RequestContext(self, binding, soapenv)
-            request = Request(location, soapenv)
-            request.headers = self.headers()
+                return RequestContext(self, binding, request.message)
+            if self.streamable(binding):
+                return self.stream(binding, request)
             timer.start()
             reply = transport.send(request)
             timer.stop()
             metrics.log.debug('waited %s on server reply', timer)
-            ctx = plugins.message.received(reply=reply.message)
-            reply.message = ctx.reply
-            if retxml:
-                result = reply.message
-            else:
-                result = self.succeeded(binding, reply.message)
+            result = self.received(binding, reply)
         except TransportError, e:
-            if e.httpcode in (202,204):
-                result = None
-            else:
-                log.error(self.last_sent())
-                result = self.failed(binding, e)
+            result = self.rejected(binding, e)
         return result
+
+    def request(self, soapenv):
+        """
+        Build the transport request for a soap message.  The I{marshalled}
+        and I{sending} plugins are notified.  The envelope's root is only
+        needed by I{marshalled} plugins, so a template envelope
+        (L{suds.bindings.template.Envelope}) is not parsed without them.
+        @param soapenv: A soap envelope to send.
+        @type soapenv: L{Document}
+        @return: The request to send.
+        @rtype: L{Request}
+        """
+        self.last_sent(soapenv)
+        plugins = PluginContainer(self.options.plugins)
+        if len(plugins.message.plugins):
+            plugins.message.marshalled(envelope=soapenv.root())
+        message = StringIO()
+        soapenv.write(message, self.options.prettyxml, 'utf-8')
+        ctx = plugins.message.sending(envelope=message.getvalue())
+        request = Request(self.location(), ctx.envelope)
+        request.headers = self.headers()
+        return request
+
+    def received(self, binding, reply):
+        """
+        Process the reply to a sent request.  The I{received} plugins
+        are notified.
+        @param binding: The binding to be used to process the reply.
+        @type binding: L{bindings.binding.Binding}
+        @param reply: The transport reply.
+        @type reply: L{Reply}
+        @return: The method result, or the reply text when I{retxml}
+            is specified.
+        @rtype: I{builtin}, L{Object}
+        """
+        plugins = PluginContainer(self.options.plugins)
+        ctx = plugins.message.received(reply=reply.message)
+        reply.message = ctx.reply
+        if self.options.retxml:
+            return reply.message
+        else:
+            return self.succeeded(binding, reply.message)
+
+    def rejected(self, binding, error):
+        """
+        Process a transport error for a sent request.
+        @param binding: The binding to be used to process the reply.
+        @type binding: L{bindings.binding.Binding}
+        @param error: The transport error.
+        @type error: L{TransportError}
+        @return: The method result.
+        @rtype: I{builtin}, L{Object}
+        """
+        if error.httpcode in (202,204):
+            return None
+        log.error(self.last_sent())
+        return self.failed(binding, error)
     
+    def streamable(self, binding):
+        """
+        Get whether the reply is to be streamed.
+        @param binding: The binding to be used to process the reply.
+        @type binding: L{bindings.binding.Binding}
+        @rtype: bool
+        """
+        if self.options.retxml or not self.options.streamreply:
+            return False
+        return binding.streamable(self.method)
+
+    def stream(self, binding, request):
+        """
+        Send the request and stream the reply.
+        @param binding: The binding to be used to process the reply.
+        @type binding: L{bindings.binding.Binding}
+        @param request: The request to send.
+        @type request: L{Request}
+        @return: A generator of the method result items.
+        @rtype: generator
+        @raise TransportError: When the request fails.
+        """
+        reply = self.options.transport.stream(request)
+        if reply is None:
+            result = iter(())
+        else:
+            result = self.bound(binding.get_reply_stream, self.method, reply.message)
+        if self.options.faults:
+            return result
+        else:
+            return (200, result)
+
     def headers(self):
         """
         Get http headers or the http/https request.
@@ -683,7 +834,7 @@ class SoapClient:
         log.debug('http succeeded:\n%s', reply)
         plugins = PluginContainer(self.options.plugins)
         if len(reply) > 0:
-            reply, result = binding.get_reply(self.method, reply)
+            reply, result = self.bound(binding.get_reply, self.method, reply)
             self.last_received(reply)
         else:
             result = None
@@ -707,7 +858,7 @@ class SoapClient:
         log.debug('http failed:\n%s', reply)
         if status == 500:
             if len(reply) > 0:
-                r, p = binding.get_fault(reply)
+                r, p = self.bound(binding.get_fault, reply)
                 self.last_received(r)
                 return (status, p)
             else:
@@ -717,6 +868,23 @@ class SoapClient:
         else:
             return (status, None)
 
+    def bound(self, fn, *args):
+        """
+        Call a binding method using the options of this client, rather
+        than those of the client that loaded the (shared) WSDL.
+        @param fn: A bound L{Binding} method.
+        @type fn: callable
+        @param args: The method arguments.
+        @type args: list
+        @return: The method result.
+        """
+        previous = getattr(bindingcontext, 'options', None)
+        bindingcontext.options = self.options
+        try:
+            return fn(*args)
+        finally:
+            bindingcontext.options = previous
+
     def location(self):
         p = Unskin(self.options)
         return p.get('location', self.method.location)
@@ -770,14 +938,14 @@ class SimClient(SoapClient):
             if fault is not None:
                 return self.__fault(fault)
             raise Exception('(reply|fault) expected when msg=None')
-        sax = Parser()
+        sax = Parser(self.options.parser)
         msg = sax.parse(string=msg)
         return self.send(msg)
     
     def __reply(self, reply, args, kwargs):
         """ simulate the reply """
         binding = self.method.binding.input
-        msg = binding.get_message(self.method, args, kwargs)
+        msg = self.bound(binding.get_message, self.method, args, kwargs)
         log.debug('inject (simulated) send message:\n%s', msg)
         binding = self.method.binding.output
         return self.succeeded(binding, reply)
@@ -786,7 +954,7 @@ class SimClient(SoapClient):
         """ simulate the (fault) reply """
         binding = self.method.binding.output
         if self.options.faults:
-            r, p = binding.get_fault(reply)
+            r, p = self.bound(binding.get_fault, reply)
             self.last_received(r)
             return (500, p)
         else:
@@ -268,8 +268,8 @@ class ElementWrapper(Element):
         Element.__init__(self, content.name, content.parent)
         self.__content = content
         
-    def str(self, indent=0):
-        return self.__content.str(indent)
+    def serialize(self, write, pretty=False, indent=0):
+        self.__content.serialize(write, pretty, indent)
 
 
 class ElementAppender(Appender):
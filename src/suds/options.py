@@ -97,6 +97,15 @@ class Options(Skin):
                   - 0 = Cache XML documents.
                   - 1 = Cache WSDL (pickled) object.
                 - default: 0
+        - B{revalidate} - The number of seconds after which a cached
+            XML document is revalidated using a conditional GET
+            (I{If-None-Match}/I{If-Modified-Since}).  When the server
+            replies I{304 Not Modified}, the cached document is used and
+            its cache duration restarted.  Applies when I{cachingpolicy}
+            = B{0}.  A value of 0 means documents are used until they
+            expire from the cache.
+                - type: I{int}
+                - default: 0
         - B{plugins} - A plugin container.
                 - type: I{list}
         - B{nosend} - Create the soap envelope but don't send.
@@ -104,6 +113,37 @@ class Options(Skin):
             instead of sending it.
                 - type: I{bool}
                 - default: False
+        - B{snapshot} - The path to a compiled WSDL snapshot (see
+            L{suds.snapshot}).  When the snapshot can be used, the WSDL
+            is not parsed and built.  Otherwise it is ignored.
+                - type: I{str}
+                - default: None
+        - B{snapshotcheck} - Verify that the snapshot was compiled from
+            the current WSDL content (sha1) before using it.  This reads
+            but does not parse the WSDL.
+                - type: I{bool}
+                - default: True
+        - B{parser} - The XML parser backend used for WSDL, schema and
+            reply documents (see L{suds.sax.parser.Parser}).  I{sax}
+            uses L{xml.sax}; I{expat} drives pyexpat directly and is
+            faster.  Both build the same document.
+                - type: I{str}
+                - default: 'sax'
+        - B{streamreply} - Methods that return a I{list} return a
+            generator of the list items instead, which unmarshals each
+            item as the reply is received and parsed.  Memory use is
+            then bounded by the size of an item rather than of the
+            reply.  Message plugins are not passed the reply and
+            I{last_received()} is not set.  Ignored when I{retxml} is
+            set and for I{rpc/encoded} methods.
+                - type: I{bool}
+                - default: False
+        - B{templates} - Build the soap message of methods whose
+            parameters are all of builtin types from a precompiled
+            template (see L{suds.bindings.template}) rather than by
+            marshalling.  Not used with soap headers or plugins.
+                - type: I{bool}
+                - default: True
     """    
     def __init__(self, **kwargs):
         domain = __name__
@@ -123,7 +163,13 @@ class Options(Skin):
             Definition('prettyxml', bool, False),
             Definition('autoblend', bool, False),
             Definition('cachingpolicy', int, 0),
+            Definition('revalidate', (int, float), 0),
             Definition('plugins', (list, tuple), []),
             Definition('nosend', bool, False),
+            Definition('snapshot', basestring, None),
+            Definition('snapshotcheck', bool, True),
+            Definition('parser', basestring, 'sax'),
+            Definition('streamreply', bool, False),
+            Definition('templates', bool, True),
         ]
         Skin.__init__(self, domain, definitions, kwargs)
@@ -19,8 +19,16 @@ Contains xml document reader classes.
 """
 
 
+import suds
+import time
+import httplib
+import socket
+import urllib2 as u2
+from hashlib import sha1
 from suds.sax.parser import Parser
-from suds.transport import Request
+from suds.sax.element import Element
+from suds.sax.document import Document
+from suds.transport import Request, TransportError
 from suds.cache import Cache, NoCache
 from suds.store import DocumentStore
 from suds.plugin import PluginContainer
@@ -47,10 +55,30 @@ class Reader:
 
     def mangle(self, name, x):
         """
-        Mangle the name by hashing the I{name} and appending I{x}.
+        Mangle the name into a cache key: a stable (sha1) digest of
+        the I{name}, the suds version and the options that shape the
+        objects built from the document, with I{x} appended.  The key
+        is the same in every process and on every machine, so shared
+        caches hit, and changes to any of the parts are cache misses.
+        The key does not depend on the document content: a changed
+        document is found using the I{revalidate} option.
+        @param name: The name (url) of the document.
+        @type name: str
+        @param x: The kind of object cached.
+        @type x: str
         @return: the mangled name.
         """
-        h = abs(hash(name))
+        options = self.options
+        parts = [
+            name,
+            x,
+            suds.__version__,
+            fingerprint(options.doctor),
+            ','.join([classpath(p) for p in options.plugins]),
+            str(options.autoblend),
+            str(options.xstq),
+        ]
+        h = sha1('\0'.join([utf8(p) for p in parts])).hexdigest()
         return '%s-%s' % (h, x)
 
 
@@ -58,6 +86,10 @@ class DocumentReader(Reader):
     """
     The XML document reader provides an integration
     between the SAX L{Parser} and the document cache.
+    When the I{revalidate} option is set, the http validators
+    (I{ETag} and I{Last-Modified}) of downloaded documents are
+    cached with them, and cached documents are revalidated using
+    a conditional GET once they are I{revalidate} seconds old.
     """
     
     def open(self, url):
@@ -75,12 +107,124 @@ class DocumentReader(Reader):
         cache = self.cache()
         id = self.mangle(url, 'document')
         d = cache.get(id)
+        if d is not None and self.options.revalidate:
+            d = self.revalidate(url, id, d)
         if d is None:
-            d = self.download(url)
-            cache.put(id, d)
+            lock = cache.lock(id)
+            lock.acquire()
+            try:
+                # another client may have cached it while we waited
+                d = cache.get(id)
+                if d is None:
+                    content, validators = self.fetch(url)
+                    d = self.parse(url, content)
+                    cache.put(id, d)
+                    self.putvalidators(url, validators)
+            finally:
+                lock.release()
         self.plugins.document.parsed(url=url, document=d.root())
         return d
     
+    def revalidate(self, url, id, d):
+        """
+        Revalidate a cached document with a conditional GET when its
+        validators were last checked more than I{revalidate} seconds ago.
+        On I{304 Not Modified} the cached document is kept and its
+        cache duration restarted (see L{Cache.touch}), otherwise the
+        new document replaces it.  When the server can't be reached,
+        the cached document is used.
+        @param url: A document url.
+        @type url: str.
+        @param id: The cache id of the document.
+        @type id: str
+        @param d: The cached document.
+        @type d: I{Document}
+        @return: The (revalidated) document.
+        @rtype: I{Document}
+        """
+        cache = self.cache()
+        record = cache.get(self.mangle(url, 'validators'))
+        if record is None:
+            return d
+        validators = record.root()
+        checked = float(validators.get('checked', default='0'))
+        if time.time()-checked < self.options.revalidate:
+            return d
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators.get('etag')
+        if validators.get('lastmodified'):
+            headers['If-Modified-Since'] = validators.get('lastmodified')
+        try:
+            content, received = self.fetch(url, headers)
+        except (TransportError, u2.URLError, socket.error, httplib.HTTPException), e:
+            log.debug('revalidating %s failed: %s', url, e)
+            return d
+        if content is None:
+            log.debug('%s not modified', url)
+            self.putvalidators(url, validators)
+            cache.touch(id)
+            return d
+        d = self.parse(url, content)
+        cache.put(id, d)
+        self.putvalidators(url, received)
+        return d
+    
+    def fetch(self, url, headers={}):
+        """
+        Get the content of a document and its http validators.
+        @param url: A document url.
+        @type url: str.
+        @param headers: Additional (conditional) request headers.
+        @type headers: dict
+        @return: (content, validators).  The content is None when the
+            server replied I{304 Not Modified}.
+        @rtype: (str, I{Element})
+        """
+        store = DocumentStore()
+        fp = store.open(url)
+        if fp is None:
+            request = Request(url)
+            request.headers.update(headers)
+            try:
+                fp = self.options.transport.open(request)
+            except TransportError, e:
+                if e.httpcode == 304:
+                    return (None, None)
+                raise
+        try:
+            content = fp.read()
+            info = getattr(fp, 'info', None)
+            if info is None:
+                return (content, None)
+            info = info()
+        finally:
+            fp.close()
+        etag = info.getheader('etag')
+        lastmodified = info.getheader('last-modified')
+        if etag is None and lastmodified is None:
+            return (content, None)
+        validators = Element('validators')
+        if etag is not None:
+            validators.set('etag', etag)
+        if lastmodified is not None:
+            validators.set('lastmodified', lastmodified)
+        return (content, validators)
+    
+    def putvalidators(self, url, validators):
+        """
+        Cache the validators of a document, recording when they were
+        (last) checked.
+        @param url: A document url.
+        @type url: str.
+        @param validators: The validators, or None.
+        @type validators: I{Element}
+        """
+        if validators is None or not self.options.revalidate:
+            return
+        validators.set('checked', str(time.time()))
+        self.cache().put(self.mangle(url, 'validators'), Document(validators))
+    
     def download(self, url):
         """
         Download the docuemnt.
@@ -89,15 +233,21 @@ class DocumentReader(Reader):
         @return: A file pointer to the docuemnt.
         @rtype: file-like
         """
-        store = DocumentStore()
-        fp = store.open(url)
-        if fp is None:
-            fp = self.options.transport.open(Request(url))
-        content = fp.read()
-        fp.close()
+        return self.parse(url, self.fetch(url)[0])
+    
+    def parse(self, url, content):
+        """
+        Parse the (downloaded) document content.
+        @param url: A document url.
+        @type url: str.
+        @param content: The document content.
+        @type content: str
+        @return: The parsed document.
+        @rtype: I{Document}
+        """
         ctx = self.plugins.document.loaded(url=url, document=content)
         content = ctx.document 
-        sax = Parser()
+        sax = Parser(self.options.parser)
         return sax.parse(string=content)
     
     def cache(self):
@@ -149,12 +299,20 @@ class DefinitionsReader(Reader):
         id = self.mangle(url, 'wsdl')
         d = cache.get(id)
         if d is None:
-            d = self.fn(url, self.options)
-            cache.put(id, d)
-        else:
-            d.options = self.options
-            for imp in d.imports:
-                imp.imported.options = self.options
+            lock = cache.lock(id)
+            lock.acquire()
+            try:
+                # another client may have cached it while we waited
+                d = cache.get(id)
+                if d is None:
+                    d = self.fn(url, self.options)
+                    cache.put(id, d)
+                    return d
+            finally:
+                lock.release()
+        d.options = self.options
+        for imp in d.imports:
+            imp.imported.options = self.options
         return d
 
     def cache(self):
@@ -166,4 +324,60 @@ class DefinitionsReader(Reader):
         if self.options.cachingpolicy == 1:
             return self.options.cache
         else:
-            return NoCache()
\ No newline at end of file
+            return NoCache()
+
+
+def classpath(object):
+    """
+    Get the (module qualified) class name of an object.  Plugins are
+    identified by this alone because their state (eg: counters or
+    connections) changes between runs.
+    @param object: An object, eg: a L{suds.plugin.Plugin}.
+    @type object: any
+    @rtype: str
+    """
+    cls = object.__class__
+    return '%s.%s' % (cls.__module__, cls.__name__)
+
+
+def utf8(object):
+    """
+    Get the utf-8 encoded string of an object, for hashing.  Unlike
+    str(), a unicode with non-ascii characters (eg: a url) is encoded
+    rather than raising UnicodeEncodeError.
+    @param object: An object, eg: a L{fingerprint}.
+    @type object: any
+    @rtype: str
+    """
+    if isinstance(object, str):
+        return object
+    return unicode(object).encode('utf-8')
+
+
+def fingerprint(object, depth=8):
+    """
+    Get a string that identifies an object by its class and state,
+    and is stable across processes (unlike id() or the default repr()).
+    @param object: An object, eg: a L{suds.xsd.doctor.Doctor}.
+    @type object: any
+    @param depth: The max depth of nested state included.
+    @type depth: int
+    @rtype: str
+    """
+    if object is None or isinstance(object, (basestring, int, long, float, bool)):
+        return repr(object)
+    depth -= 1
+    if isinstance(object, (list, tuple)):
+        if depth < 0:
+            return '[]'
+        return '[%s]' % ','.join([fingerprint(x, depth) for x in object])
+    if isinstance(object, dict):
+        if depth < 0:
+            return '{}'
+        items = sorted(object.items())
+        return '{%s}' % ','.join(['%s:%s' % (k, fingerprint(v, depth)) for k, v in items])
+    name = classpath(object)
+    state = getattr(object, '__dict__', None)
+    if state is None or depth < 0:
+        return name
+    return name + fingerprint(state, depth)
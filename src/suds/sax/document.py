@@ -54,6 +54,15 @@ class Document(Element):
         s.append(self.root().plain())
         return ''.join(s)
 
+    def write(self, fp, pretty=False, encoding=None):
+        if encoding is None:
+            fp.write(self.DECL)
+        else:
+            fp.write(self.DECL.encode(encoding))
+        if pretty:
+            fp.write('\n')
+        self.root().write(fp, pretty, encoding)
+
     def __str__(self):
         return unicode(self).encode('utf-8')
     
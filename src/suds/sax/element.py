@@ -747,26 +747,9 @@ class Element:
         @return: A I{pretty} string.
         @rtype: basestring
         """
-        tab = '%*s'%(indent*3,'')
         result = []
-        result.append('%s<%s' % (tab, self.qname()))
-        result.append(self.nsdeclarations())
-        for a in [unicode(a) for a in self.attributes]:
-            result.append(' %s' % a)
-        if self.isempty():
-            result.append('/>')
-            return ''.join(result)
-        result.append('>')
-        if self.hasText():
-            result.append(self.text.escape())
-        for c in self.children:
-            result.append('\n')
-            result.append(c.str(indent+1))
-        if len(self.children):
-            result.append('\n%s' % tab)
-        result.append('</%s>' % self.qname())
-        result = ''.join(result)
-        return result
+        self.serialize(result.append, True, indent)
+        return ''.join(result)
     
     def plain(self):
         """
@@ -775,21 +758,77 @@ class Element:
         @rtype: basestring
         """
         result = []
-        result.append('<%s' % self.qname())
-        result.append(self.nsdeclarations())
-        for a in [unicode(a) for a in self.attributes]:
-            result.append(' %s' % a)
-        if self.isempty():
-            result.append('/>')
-            return ''.join(result)
-        result.append('>')
-        if self.hasText():
-            result.append(self.text.escape())
-        for c in self.children:
-            result.append(c.plain())
-        result.append('</%s>' % self.qname())
-        result = ''.join(result)
-        return result
+        self.serialize(result.append)
+        return ''.join(result)
+
+    def write(self, fp, pretty=False, encoding=None):
+        """
+        Write this XML fragment to a I{file-like} object, such as a
+        buffer or a request body, without building the whole string.
+        @param fp: A I{file-like} object.
+        @type fp: I{file-like}
+        @param pretty: Write the I{pretty} representation, see L{str}.
+        @type pretty: boolean
+        @param encoding: Encode the output with this encoding, as
+            needed to write unicode to a byte stream.
+        @type encoding: str
+        """
+        if encoding is None:
+            write = fp.write
+        else:
+            write = lambda s: fp.write(s.encode(encoding))
+        self.serialize(write, pretty)
+
+    def serialize(self, write, pretty=False, indent=0):
+        """
+        Serialize this XML fragment.  The tree is walked iteratively and
+        each part of the output is passed to I{write} as it is produced,
+        so that no string is built for a subtree.
+        @param write: Called with each part of the output.
+        @type write: callable
+        @param pretty: Produce the I{pretty} representation, see L{str}.
+        @type pretty: boolean
+        @param indent: The indent of this element when I{pretty}.
+        @type indent: int
+        """
+        tab = ''
+        stack = [(self, indent, '')]
+        while len(stack):
+            item = stack.pop()
+            if isinstance(item, basestring):
+                write(item)
+                continue
+            node, indent, lead = item
+            if lead:
+                write(lead)
+            if node.__class__ is not Element and node is not self:
+                # subclasses (eg: the marshaller's wrapper) may override
+                node.serialize(write, pretty, indent)
+                continue
+            if pretty:
+                tab = '%*s' % (indent*3, '')
+            qname = node.qname()
+            write('%s<%s' % (tab, qname))
+            write(node.nsdeclarations())
+            for a in node.attributes:
+                write(' ')
+                write(unicode(a))
+            if node.isempty():
+                write('/>')
+                continue
+            write('>')
+            if node.hasText():
+                write(node.text.escape())
+            children = node.children
+            if pretty and len(children):
+                stack.append('\n%s</%s>' % (tab, qname))
+                lead = '\n'
+            else:
+                stack.append('</%s>' % qname)
+                lead = ''
+            indent += 1
+            for i in xrange(len(children)-1, -1, -1):
+                stack.append((children[i], indent, lead))
 
     def nsdeclarations(self):
         """
@@ -29,6 +29,16 @@ class Encoder:
     @type decodings: [(str,str)]
     @cvar special: A list of special characters
     @type special: [char]
+    @cvar safe: Every byte other than a special character or I{;}.
+        The utf-8 encoding of a non-ascii character only uses bytes
+        >= 0x80, so deleting the I{safe} bytes leaves just the special
+        characters and the I{;} that may end an entity.
+    @type safe: str
+    @cvar ampersand: The compiled I{&} encoding pattern.
+    @type ampersand: I{Pattern}
+    @cvar short: Strings shorter than this are first checked for each
+        special character in turn, which is cheaper than encoding them.
+    @type short: int
     """
     
     encodings = \
@@ -37,6 +47,23 @@ class Encoder:
         (( '&lt;', '<' ),( '&gt;', '>' ),( '&quot;', '"' ),( '&apos;', "'" ),( '&amp;', '&' ))
     special = \
         ('&', '<', '>', '"', "'")
+    safe = \
+        ''.join([chr(i) for i in range(256) if chr(i) not in special+(';',)])
+    ampersand = re.compile(encodings[0][0])
+    short = 256
+    
+    def found(self, s):
+        """
+        Get the special characters (and I{;}) found in string I{s}, in a
+        single pass over the string.
+        @param s: A string to check.
+        @type s: basestring
+        @return: The special characters and I{;}, in order, as found.
+        @rtype: str
+        """
+        if isinstance(s, unicode):
+            s = s.encode('utf-8')
+        return s.translate(None, self.safe)
     
     def needsEncoding(self, s):
         """
@@ -47,23 +74,47 @@ class Encoder:
         @rtype: boolean
         """
         if isinstance(s, basestring):
-            for c in self.special:
-                if c in s:
-                    return True
+            return len(self.found(s).strip(';')) > 0
         return False
     
     def encode(self, s):
         """
-        Encode special characters found in string I{s}.
+        Encode special characters found in string I{s}.  A long string is
+        scanned once and most text (eg: base64) has no special characters
+        so is returned as is.  Otherwise, only the special characters
+        found are replaced, in the utf-8 encoding of unicode strings.  An
+        I{&} is only checked for a following entity when there is a I{;}.
         @param s: A string to encode.
         @type s: str
         @return: The encoded string.
         @rtype: str
         """
-        if isinstance(s, basestring) and self.needsEncoding(s):
-            for x in self.encodings:
-                s = re.sub(x[0], x[1], s)
-        return s
+        if not isinstance(s, basestring):
+            return s
+        if len(s) < self.short:
+            for c in self.special:
+                if c in s:
+                    break
+            else:
+                return s
+        if isinstance(s, unicode):
+            encoded = s.encode('utf-8')
+        else:
+            encoded = s
+        found = encoded.translate(None, self.safe)
+        if not found.strip(';'):
+            return s
+        if '&' in found:
+            if ';' in found:
+                encoded = self.ampersand.sub(self.encodings[0][1], encoded)
+            else:
+                encoded = encoded.replace('&', self.encodings[0][1])
+        for x in self.encodings[1:]:
+            if x[0] in found:
+                encoded = encoded.replace(x[0], x[1])
+        if isinstance(s, unicode):
+            return encoded.decode('utf-8')
+        return encoded
     
     def decode(self, s):
         """
@@ -36,7 +36,9 @@ from suds.sax.text import Text
 from suds.sax.attribute import Attribute
 from xml.sax import make_parser, InputSource, ContentHandler
 from xml.sax.handler import feature_external_ges
+from xml.parsers import expat
 from cStringIO import StringIO
+from types import InstanceType
 
 log = getLogger(__name__)
 
@@ -103,9 +105,156 @@ class Handler(ContentHandler):
         return self.nodes[len(self.nodes)-1]
 
 
+class ExpatHandler:
+    """
+    A handler that drives pyexpat directly and builds the same
+    L{Element} tree as L{Handler} with fewer allocations.  Names are
+    interned and split into (I{prefix}, I{name}) once per parse, names
+    and values are not copied and elements and attributes are created
+    without running their constructors.
+    @ivar nodes: The stack of open nodes.  The first is the L{Document}.
+    @type nodes: [L{Element},..]
+    @ivar chunks: The character data of each open node.
+    @type chunks: [[unicode,..],..]
+    @ivar names: Split (I{prefix}, I{name}) tuples by qualified name.
+    @type names: dict
+    @ivar strings: The interned names, shared with expat.
+    @type strings: dict
+    """
+
+    def __init__(self):
+        self.nodes = [Document()]
+        self.chunks = [None]
+        self.names = {}
+        self.strings = {}
+
+    def parser(self):
+        """
+        Create an expat parser bound to this handler.
+        @return: An expat parser.
+        @rtype: I{xmlparser}
+        """
+        p = expat.ParserCreate(None, None, self.strings)
+        p.buffer_text = True
+        p.ordered_attributes = True
+        p.StartElementHandler = self.startElement
+        p.EndElementHandler = self.endElement
+        p.CharacterDataHandler = self.characters
+        return p
+
+    def split(self, qname):
+        split = self.names.get(qname)
+        if split is None:
+            prefix, name = splitPrefix(qname)
+            if prefix is not None:
+                prefix = self.strings.setdefault(prefix, prefix)
+                name = self.strings.setdefault(name, name)
+            split = (prefix, name)
+            self.names[qname] = split
+        return split
+
+    def startElement(self, qname, attrs):
+        top = self.nodes[-1]
+        prefix, name = self.split(qname)
+        node = InstanceType(Element, dict(
+            prefix=prefix,
+            name=name,
+            expns=None,
+            nsprefixes={},
+            attributes=[],
+            text=None,
+            parent=top,
+            children=[]))
+        for i in xrange(0, len(attrs), 2):
+            prefix, name = self.split(attrs[i])
+            value = attrs[i+1]
+            if prefix is None and name == 'xmlns':
+                if len(value):
+                    node.expns = value
+                continue
+            if prefix == 'xmlns':
+                node.nsprefixes[name] = value
+                continue
+            node.attributes.append(InstanceType(Attribute, dict(
+                parent=node,
+                prefix=prefix,
+                name=name,
+                value=Text(value))))
+        top.children.append(node)
+        self.nodes.append(node)
+        self.chunks.append(None)
+
+    def endElement(self, qname):
+        node = self.nodes.pop()
+        chunks = self.chunks.pop()
+        if chunks is not None:
+            node.text = Text(u''.join(chunks))
+            if len(node.children):
+                node.trim()
+
+    def characters(self, content):
+        chunks = self.chunks[-1]
+        if chunks is None:
+            self.chunks[-1] = [content]
+        else:
+            chunks.append(content)
+
+
+class StreamHandler(ExpatHandler):
+    """
+    An L{ExpatHandler} for parsing a document as it is received.
+    Elements completed at I{depth} are detached from their parent and
+    queued in I{completed}, so that only the open part of the document
+    is held in memory.  A detached element keeps its I{parent} so that
+    namespace prefixes still resolve.
+    @ivar depth: The depth of the queued elements.  The root element
+        has a depth of 1.
+    @type depth: int
+    @ivar completed: The elements completed at I{depth}.
+    @type completed: [L{Element},..]
+    """
+
+    def __init__(self, depth):
+        """
+        @param depth: The depth of the elements to queue.
+        @type depth: int
+        """
+        ExpatHandler.__init__(self)
+        self.depth = depth
+        self.completed = []
+
+    def endElement(self, qname):
+        node = self.nodes[-1]
+        ExpatHandler.endElement(self, qname)
+        if len(self.nodes) == self.depth:
+            self.nodes[-1].children.pop()
+            # the whitespace between detached elements is not content
+            self.chunks[-1] = None
+            self.completed.append(node)
+
+
 class Parser:
-    """ SAX Parser """
-    
+    """
+    SAX Parser
+    @cvar backends: The supported parser backends.  I{sax} uses
+        the L{xml.sax} L{Handler}; I{expat} uses the L{ExpatHandler}.
+        Both build the same tree.
+    @type backends: (str,..)
+    @ivar backend: The backend used by this parser.
+    @type backend: str
+    """
+
+    backends = ('sax', 'expat')
+
+    def __init__(self, backend='sax'):
+        """
+        @param backend: The parser backend, one of L{backends}.
+        @type backend: str
+        """
+        if backend not in self.backends:
+            raise Exception('parser backend "%s" not-valid' % backend)
+        self.backend = backend
+
     @classmethod
     def saxparser(cls):
         p = make_parser()
@@ -124,6 +273,8 @@ class Parser:
         """
         timer = metrics.Timer()
         timer.start()
+        if self.backend == 'expat':
+            return self.expatparse(timer, file, string)
         sax, handler = self.saxparser()
         if file is not None:
             sax.parse(file)
@@ -136,4 +287,27 @@ class Parser:
             sax.parse(source)
             timer.stop()
             metrics.log.debug('%s\nsax duration: %s', string, timer)
-            return handler.nodes[0]
\ No newline at end of file
+            return handler.nodes[0]
+
+    def expatparse(self, timer, file=None, string=None):
+        """
+        Parse XML text using the L{ExpatHandler}.
+        @param timer: The started parse timer.
+        @type timer: L{metrics.Timer}
+        @param file: Parse a python I{file-like} object.
+        @type file: I{file-like} object.
+        @param string: Parse string XML.
+        @type string: str
+        """
+        handler = ExpatHandler()
+        p = handler.parser()
+        if file is not None:
+            p.ParseFile(file)
+            timer.stop()
+            metrics.log.debug('expat (%s) duration: %s', file, timer)
+            return handler.nodes[0]
+        if string is not None:
+            p.Parse(string, True)
+            timer.stop()
+            metrics.log.debug('%s\nexpat duration: %s', string, timer)
+            return handler.nodes[0]
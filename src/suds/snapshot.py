@@ -0,0 +1,205 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the (LGPL) GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Library Lesser General Public License for more details at
+# ( http://www.gnu.org/licenses/lgpl.html ).
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+Contains classes for compiling a WSDL ahead of time into a snapshot
+of the fully built L{Definitions} and L{ServiceDefinition} objects, and
+for loading a client from it.  A snapshot file is a pickled header
+followed by the pickled objects, so a stale or incompatible snapshot is
+rejected without unpickling the (large) object graph.
+"""
+
+import os
+import suds
+from hashlib import sha1
+from suds.store import DocumentStore
+from suds.transport import Request
+from logging import getLogger
+
+try:
+    import cPickle as pickle
+except:
+    import pickle
+
+
+log = getLogger(__name__)
+
+MAGIC = 'suds-snapshot'
+FORMAT = 1
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def fetch(url, options):
+    """
+    Get the raw content of the WSDL at the specified I{url}.
+    @param url: A WSDL url.
+    @type url: str
+    @param options: An options object.
+    @type options: I{Options}
+    @return: The WSDL content.
+    @rtype: str
+    """
+    store = DocumentStore()
+    fp = store.open(url)
+    if fp is None:
+        fp = options.transport.open(Request(url))
+    try:
+        return fp.read()
+    finally:
+        fp.close()
+
+
+def digest(content):
+    """
+    Get the digest used to match a snapshot to its source WSDL.
+    @param content: The WSDL content.
+    @type content: str
+    @rtype: str
+    """
+    return sha1(content).hexdigest()
+
+
+class Snapshot:
+    """
+    A compiled WSDL snapshot file.
+    @ivar path: The path to the snapshot file.
+    @type path: str
+    """
+
+    protocol = 2
+
+    def __init__(self, path):
+        """
+        @param path: The path to the snapshot file.
+        @type path: str
+        """
+        self.path = path
+
+    def header(self, fp):
+        """
+        Read and check the snapshot header.
+        @param fp: An open snapshot file.
+        @type fp: file
+        @return: The header.
+        @rtype: dict
+        @raise SnapshotError: When the file is not a snapshot or was
+            written by a different version of suds.
+        """
+        try:
+            header = pickle.load(fp)
+        except Exception, e:
+            raise SnapshotError('%s: not a snapshot (%s)' % (self.path, e))
+        if not isinstance(header, dict) or header.get('magic') != MAGIC:
+            raise SnapshotError('%s: not a snapshot' % self.path)
+        if header.get('format') != FORMAT:
+            raise SnapshotError('%s: snapshot format %s, expected %s'
+                % (self.path, header.get('format'), FORMAT))
+        if header.get('suds') != suds.__version__:
+            raise SnapshotError('%s: compiled by suds %s, running %s'
+                % (self.path, header.get('suds'), suds.__version__))
+        return header
+
+    def save(self, url, content, wsdl, sd):
+        """
+        Write the snapshot.  The file is written alongside and renamed
+        into place so that readers never see a partial snapshot.
+        @param url: The WSDL url.
+        @type url: str
+        @param content: The WSDL content that I{wsdl} was built from.
+        @type content: str
+        @param wsdl: The WSDL object.
+        @type wsdl: L{Definitions}
+        @param sd: The service definitions.
+        @type sd: [L{ServiceDefinition},..]
+        """
+        header = dict(magic=MAGIC, format=FORMAT, suds=suds.__version__,
+            url=url, digest=digest(content))
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        fp = open(tmp, 'wb')
+        try:
+            pickle.dump(header, fp, self.protocol)
+            pickle.dump((wsdl, sd), fp, self.protocol)
+        finally:
+            fp.close()
+        if os.name == 'nt' and os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(tmp, self.path)
+        log.debug('snapshot of %s written to %s', url, self.path)
+
+    def load(self, url, options, check=True):
+        """
+        Load the snapshot.  After unpickling, the I{options} attribute
+        is restored as is done by the L{suds.reader.DefinitionsReader}.
+        @param url: The WSDL url the client was created with.
+        @type url: str
+        @param options: An options object.
+        @type options: I{Options}
+        @param check: Verify that the snapshot was compiled from the
+            current WSDL content.
+        @type check: bool
+        @return: (wsdl, sd)
+        @rtype: (L{Definitions}, [L{ServiceDefinition},..])
+        @raise SnapshotError: When the snapshot is missing, incompatible,
+            compiled from a different url, stale, truncated or corrupt.
+        """
+        try:
+            fp = open(self.path, 'rb')
+        except IOError, e:
+            raise SnapshotError('%s: %s' % (self.path, e))
+        try:
+            header = self.header(fp)
+            if header['url'] != url:
+                raise SnapshotError('%s: compiled from %s, not %s'
+                    % (self.path, header['url'], url))
+            if check and digest(fetch(url, options)) != header['digest']:
+                raise SnapshotError('%s: stale, %s has changed'
+                    % (self.path, url))
+            try:
+                wsdl, sd = pickle.load(fp)
+            except Exception, e:
+                # eg: EOFError or UnpicklingError when truncated or corrupt
+                raise SnapshotError('%s: not loaded (%s: %s)'
+                    % (self.path, e.__class__.__name__, e))
+        finally:
+            fp.close()
+        wsdl.options = options
+        for imp in wsdl.imports:
+            imp.imported.options = options
+        return (wsdl, sd)
+
+
+def compile(url, path, **kwargs):
+    """
+    Compile the WSDL at I{url} into a snapshot file.
+    @param url: The URL for the WSDL.
+    @type url: str
+    @param path: The path of the snapshot file to write.
+    @type path: str
+    @param kwargs: Client options used to read the WSDL.
+    @see: L{suds.options.Options}
+    @return: The client built while compiling.
+    @rtype: L{suds.client.Client}
+    """
+    from suds.client import Client
+    from suds.cache import NoCache
+    kwargs['cache'] = NoCache()
+    kwargs['snapshot'] = None
+    client = Client(url, **kwargs)
+    content = fetch(url, client.options)
+    Snapshot(path).save(url, content, client.wsdl, client.sd)
+    return client
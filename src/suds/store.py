@@ -542,6 +542,9 @@ class DocumentStore:
     @type protocol: str
     @cvar store: The mapping of URL location to documents.
     @type store: dict
+    @cvar files: The mapping of URL location to the path of a
+        document file, read when the document is opened.
+    @type files: dict
     """
     
     protocol = 'suds'
@@ -550,6 +553,20 @@ class DocumentStore:
         'schemas.xmlsoap.org/soap/encoding/' : encoding
     }
     
+    files = {}
+    
+    @classmethod
+    def register(cls, location, path):
+        """
+        Add a document file to the store.  The document is
+        served as I{suds://location}.
+        @param location: The I{location} part of the URL.
+        @type location: str
+        @param path: The path to the document file.
+        @type path: str
+        """
+        cls.files[location] = path
+    
     def open(self, url):
         """
         Open a document at the specified url.
@@ -570,9 +587,11 @@ class DocumentStore:
         @param location: The I{location} part of a URL.
         @type location: str
         @return: An input stream to the document.
-        @rtype: StringIO
+        @rtype: StringIO|file
         """
         try:
+            if location in self.files:
+                return open(self.files[location], 'rb')
             content = self.store[location]
             return StringIO(content)
         except:
@@ -18,6 +18,8 @@
 Contains transport interface (classes).
 """
 
+from cStringIO import StringIO
+
 
 class TransportError(Exception):
     def __init__(self, reason, httpcode, fp=None):
@@ -30,8 +32,10 @@ class Request:
     A transport request
     @ivar url: The url for the request.
     @type url: str
-    @ivar message: The message to be sent in a POST request.
-    @type message: str
+    @ivar message: The message to be sent in a POST request.  Large
+        messages may be a file-like object (read() and len()) that is
+        streamed to the server.
+    @type message: str|file-like
     @ivar headers: The http headers to be used for the request.
     @type headers: dict
     """
@@ -52,7 +56,10 @@ class Request:
         s.append('URL:%s' % self.url)
         s.append('HEADERS: %s' % self.headers)
         s.append('MESSAGE:')
-        s.append(self.message)
+        if isinstance(self.message, basestring):
+            s.append(self.message)
+        else:
+            s.append(str(self.message))
         return '\n'.join(s)
 
 
@@ -128,3 +135,19 @@ class Transport:
         @raise TransportError: On all transport errors.
         """
         raise Exception('not-implemented')
+
+    def stream(self, request):
+        """
+        Send soap message and get the reply without reading it, so that
+        it can be parsed as it is received.  By default, the reply is
+        read by L{send}.
+        @param request: A transport request.
+        @type request: L{Request}
+        @return: The reply.  Its I{message} is a file-like object.
+        @rtype: L{Reply}
+        @raise TransportError: On all transport errors.
+        """
+        reply = self.send(request)
+        if reply is not None:
+            reply.message = StringIO(reply.message)
+        return reply
@@ -50,40 +50,62 @@ class HttpTransport(Transport):
         Transport.__init__(self)
         Unskin(self.options).update(kwargs)
         self.cookiejar = CookieJar()
-        self.proxy = {}
         self.urlopener = None
         
     def open(self, request):
         try:
             url = request.url
             log.debug('opening (%s)', url)
-            u2request = u2.Request(url)
-            self.proxy = self.options.proxy
+            u2request = u2.Request(url, headers=request.headers)
             return self.u2open(u2request)
         except u2.HTTPError, e:
             raise TransportError(str(e), e.code, e.fp)
 
     def send(self, request):
         result = None
+        fp = self.u2send(request)
+        if fp is not None:
+            result = Reply(200, fp.headers.dict, fp.read())
+            log.debug('received:\n%s', result)
+        return result
+
+    def stream(self, request):
+        result = None
+        fp = self.u2send(request, True)
+        if fp is not None:
+            result = Reply(200, fp.headers.dict, fp)
+        return result
+
+    def u2send(self, request, stream=False):
+        """
+        Post the request.
+        @param request: A transport request.
+        @type request: L{Request}
+        @param stream: The reply will be read as it is received, so
+            handlers that would buffer it should not (the urllib2
+            request is marked with a I{stream} attribute).
+        @type stream: bool
+        @return: The open reply, or None for an http 202 or 204.
+        @rtype: I{addinfourl}
+        @raise TransportError: On an http error.
+        """
         url = request.url
         msg = request.message
         headers = request.headers
         try:
             u2request = u2.Request(url, msg, headers)
+            u2request.stream = stream
             self.addcookies(u2request)
-            self.proxy = self.options.proxy
             request.headers.update(u2request.headers)
             log.debug('sending:\n%s', request)
             fp = self.u2open(u2request)
             self.getcookies(fp, u2request)
-            result = Reply(200, fp.headers.dict, fp.read())
-            log.debug('received:\n%s', result)
+            return fp
         except u2.HTTPError, e:
             if e.code in (202,204):
-                result = None
+                return None
             else:
                 raise TransportError(e.msg, e.code, e.fp)
-        return result
 
     def addcookies(self, u2request):
         """
@@ -135,7 +157,7 @@ class HttpTransport(Transport):
         @rtype: [Handler,...]
         """
         handlers = []
-        handlers.append(u2.ProxyHandler(self.proxy))
+        handlers.append(u2.ProxyHandler(self.options.proxy))
         return handlers
             
     def u2ver(self):
@@ -175,6 +197,10 @@ class HttpAuthenticated(HttpTransport):
     def send(self, request):
         self.addcredentials(request)
         return HttpTransport.send(self, request)
+
+    def stream(self, request):
+        self.addcredentials(request)
+        return HttpTransport.stream(self, request)
     
     def addcredentials(self, request):
         credentials = self.credentials()
@@ -62,6 +62,10 @@ class HttpAuthenticated(HttpTransport):
     def send(self, request):
         self.addcredentials(request)
         return  HttpTransport.send(self, request)
+
+    def stream(self, request):
+        self.addcredentials(request)
+        return  HttpTransport.stream(self, request)
     
     def addcredentials(self, request):
         credentials = self.credentials()
@@ -0,0 +1,670 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the (LGPL) GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Library Lesser General Public License for more details at
+# ( http://www.gnu.org/licenses/lgpl.html ).
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+Contains a non-blocking HTTP transport.  A single I/O thread multiplexes
+any number of in-flight requests using select() so that many soap
+calls may be outstanding without a thread per call.
+"""
+
+import os
+import errno
+import select
+import socket
+import ssl
+import time
+from threading import Thread, Lock, currentThread
+from urlparse import urlparse
+from mimetools import Message
+from cStringIO import StringIO
+from suds.transport import *
+from suds.transport.pool import Unsent
+from logging import getLogger
+
+log = getLogger(__name__)
+
+
+WOULDBLOCK = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN)
+CLOSED = (errno.EPIPE, errno.ECONNRESET, errno.ECONNABORTED)
+
+
+class Exchange:
+    """
+    A single http request/reply exchange.
+    @ivar request: The transport request.
+    @type request: L{Request}
+    @ivar callback: Called as callback(reply, exception) on completion.
+    @type callback: callable
+    @ivar deadline: The time after which the exchange times out.
+    @type deadline: float
+    @ivar retry: Whether the exchange may be retried on a new connection.
+    @type retry: bool
+    @ivar address: The resolved address as returned by getaddrinfo().
+    @type address: tuple
+    @ivar error: The exception raised resolving the address.
+    @type error: Exception
+    """
+
+    def __init__(self, request, callback, timeout):
+        """
+        @param request: The transport request.
+        @type request: L{Request}
+        @param callback: Called as callback(reply, exception) on completion.
+        @type callback: callable
+        @param timeout: The timeout (seconds).
+        @type timeout: float
+        """
+        self.request = request
+        self.callback = callback
+        self.deadline = time.time() + timeout
+        self.retry = True
+        self.address = None
+        self.error = None
+        url = urlparse(request.url)
+        self.secure = ( url.scheme == 'https' )
+        self.host = url.hostname
+        self.port = url.port or (self.secure and 443 or 80)
+        self.key = (self.secure, self.host, self.port)
+        self.head = self.message(url)
+        self.reset()
+
+    def reset(self):
+        """
+        Reset the exchange state (used when the exchange is retried).
+        """
+        body = self.request.message
+        if isinstance(body, basestring) or body is None:
+            self.outbound = ''.join((self.head, body or ''))
+            self.body = None
+        else:
+            body.seek(0)
+            self.outbound = self.head
+            self.body = body
+        self.sent = 0
+        self.written = 0
+        self.reading = ''
+        self.status = None
+        self.headers = None
+        self.parts = []
+        self.received = 0
+        self.length = None
+        self.chunked = False
+        self.pending = ''
+
+    def message(self, url):
+        """
+        Build the http request line and headers.
+        @param url: The parsed request url.
+        @type url: tuple
+        @return: The message head.
+        @rtype: str
+        """
+        selector = url.path or '/'
+        if url.query:
+            selector = '?'.join((selector, url.query))
+        body = self.request.message or ''
+        if self.port in (80, 443):
+            host = self.host
+        else:
+            host = '%s:%d' % (self.host, self.port)
+        s = []
+        s.append('POST %s HTTP/1.1' % selector)
+        s.append('Host: %s' % host)
+        for k, v in self.request.headers.items():
+            s.append('%s: %s' % (k, v))
+        s.append('Content-Length: %d' % len(body))
+        s.append('Connection: keep-alive')
+        s.append('')
+        s.append('')
+        return '\r\n'.join(s)
+
+    def outgoing(self):
+        """
+        Get the next block of the message to be sent.
+        @return: The unsent data, or an empty string when the whole
+            message has been sent.
+        @rtype: str
+        """
+        if self.sent >= len(self.outbound) and self.body is not None:
+            self.outbound = self.body.read(65536)
+            self.sent = 0
+            if not len(self.outbound):
+                self.body = None
+        return self.outbound[self.sent:self.sent+65536]
+
+    def feed(self, data):
+        """
+        Feed received data.
+        @param data: The received data.  An empty string indicates EOF.
+        @type data: str
+        @return: True when the reply is complete.
+        @rtype: bool
+        """
+        eof = ( not len(data) )
+        if self.headers is None:
+            if eof and self.status is None and not len(self.reading):
+                raise Unsent('connection closed without a reply')
+            if eof:
+                raise Exception('connection closed by server')
+            self.reading += data
+            end = self.reading.find('\r\n\r\n')
+            if end < 0:
+                return False
+            data = self.reading[end+4:]
+            self.parse(self.reading[:end])
+            self.reading = ''
+            if self.status == 100:
+                self.headers = None
+                return ( len(data) and self.feed(data) )
+        if self.chunked:
+            if eof:
+                raise Exception('connection closed during chunked reply')
+            return self.dechunk(data)
+        if len(data):
+            self.parts.append(data)
+            self.received += len(data)
+        if self.length is None:
+            return eof
+        return ( self.received >= self.length )
+
+    def parse(self, head):
+        """
+        Parse the status line and headers.
+        @param head: The reply head.
+        @type head: str
+        """
+        line, headers = head.split('\r\n', 1)
+        self.status = int(line.split()[1])
+        self.headers = Message(StringIO(headers))
+        if self.headers.get('transfer-encoding', '').lower() == 'chunked':
+            self.chunked = True
+        length = self.headers.get('content-length')
+        if length is not None:
+            self.length = int(length)
+        if self.status in (204, 304):
+            self.length = 0
+
+    def dechunk(self, data):
+        """
+        Incrementally decode a I{chunked} reply body.
+        @param data: The received data.
+        @type data: str
+        @return: True when the terminal chunk has been received.
+        @rtype: bool
+        """
+        s = self.pending + data
+        pos = 0
+        while True:
+            eol = s.find('\r\n', pos)
+            if eol < 0:
+                break
+            size = int(s[pos:eol].split(';', 1)[0], 16)
+            if size == 0:
+                # wait for the (optional) trailers and final CRLF
+                if s.find('\r\n\r\n', pos) >= 0:
+                    return True
+                break
+            end = eol + 2 + size
+            if len(s) < end + 2:
+                break
+            self.parts.append(s[eol+2:end])
+            pos = end + 2
+        self.pending = s[pos:]
+        return False
+
+    def keepalive(self):
+        """
+        Get whether the connection may be reused after this exchange.
+        @rtype: bool
+        """
+        if self.headers.get('connection', '').lower() == 'close':
+            return False
+        return ( self.chunked or self.length is not None )
+
+    def reply(self):
+        """
+        Get the reply.
+        @rtype: L{Reply}
+        """
+        return Reply(self.status, self.headers.dict, ''.join(self.parts))
+
+
+class Channel:
+    """
+    A non-blocking (optionally SSL) connection.
+    @ivar key: The pool key as (secure, host, port).
+    @type key: tuple
+    @ivar sock: The socket.
+    @type sock: socket
+    @ivar state: The connection state (connecting|handshake|open).
+    @type state: str
+    @ivar exchange: The current exchange.
+    @type exchange: L{Exchange}
+    @ivar reused: Whether the channel has completed a previous exchange.
+    @type reused: bool
+    """
+
+    def __init__(self, key, address):
+        """
+        @param key: The pool key as (secure, host, port).
+        @type key: tuple
+        @param address: The address as returned by getaddrinfo().
+        @type address: tuple
+        """
+        self.key = key
+        self.exchange = None
+        self.reused = False
+        self.released = None
+        self.wantread = False
+        self.wantwrite = True
+        family, type, proto, cn, address = address
+        self.sock = socket.socket(family, type, proto)
+        self.sock.setblocking(0)
+        err = self.sock.connect_ex(address)
+        if err and err not in WOULDBLOCK:
+            raise socket.error(err, os.strerror(err))
+        self.state = 'connecting'
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def dropped(self):
+        """
+        Get whether the server has closed the (idle) connection.  An idle
+        connection should never be readable.
+        @rtype: bool
+        """
+        try:
+            rd, wr, x = select.select([self.sock], [], [], 0)
+            return ( len(rd) > 0 )
+        except Exception:
+            return True
+
+    def start(self, exchange):
+        """
+        Start an exchange on this channel.
+        @param exchange: An exchange.
+        @type exchange: L{Exchange}
+        """
+        self.exchange = exchange
+        self.wantwrite = True
+        self.wantread = False
+
+    def writable(self):
+        """
+        The socket is writable.
+        """
+        if self.state == 'connecting':
+            err = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                raise socket.error(err, os.strerror(err))
+            if self.key[0]:
+                self.wrap()
+                self.state = 'handshake'
+            else:
+                self.state = 'open'
+        if self.state == 'handshake':
+            self.handshake()
+            return False
+        return self.send()
+
+    def readable(self):
+        """
+        The socket is readable.
+        @return: True when the exchange is complete.
+        @rtype: bool
+        """
+        if self.state == 'handshake':
+            self.handshake()
+            return False
+        if self.state != 'open':
+            return False
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except ssl.SSLError, e:
+                if e.args[0] == ssl.SSL_ERROR_WANT_READ:
+                    return False
+                raise
+            except socket.error, e:
+                if e.args[0] in WOULDBLOCK:
+                    return False
+                raise
+            if self.exchange.feed(data):
+                return True
+            if not len(data):
+                raise Exception('connection closed by server')
+
+    def send(self):
+        exchange = self.exchange
+        data = exchange.outgoing()
+        if not len(data):
+            self.wantwrite = False
+            self.wantread = True
+            return False
+        try:
+            n = self.sock.send(data)
+        except ssl.SSLError, e:
+            if e.args[0] in (ssl.SSL_ERROR_WANT_READ, ssl.SSL_ERROR_WANT_WRITE):
+                return False
+            raise
+        except socket.error, e:
+            if e.args[0] in WOULDBLOCK:
+                return False
+            if self.reused and not exchange.written and e.args[0] in CLOSED:
+                raise Unsent(e)
+            raise
+        exchange.sent += n
+        exchange.written += n
+        return False
+
+    def wrap(self):
+        host = self.key[1]
+        if hasattr(ssl, 'create_default_context'):
+            context = ssl.create_default_context()
+            self.sock = context.wrap_socket(
+                self.sock, server_hostname=host, do_handshake_on_connect=False)
+        else:
+            self.sock = ssl.wrap_socket(self.sock, do_handshake_on_connect=False)
+
+    def handshake(self):
+        try:
+            self.sock.do_handshake()
+        except ssl.SSLError, e:
+            if e.args[0] == ssl.SSL_ERROR_WANT_READ:
+                self.wantread, self.wantwrite = True, False
+                return
+            if e.args[0] == ssl.SSL_ERROR_WANT_WRITE:
+                self.wantread, self.wantwrite = False, True
+                return
+            raise
+        self.state = 'open'
+        self.wantread, self.wantwrite = False, True
+
+    def close(self):
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+
+class AsyncHttpTransport(Transport):
+    """
+    Non-blocking HTTP transport.  Requests are submitted with
+    L{submit} and complete on a single (daemon) I/O thread which
+    invokes callback(reply, exception).  Idle connections are kept
+    alive and reused.  Cookies and proxies are not supported.
+    @ivar idle: Idle channels by key.
+    @type idle: dict
+    """
+
+    def __init__(self, **kwargs):
+        """
+        @param kwargs: Keyword arguments.
+            - B{timeout} - Set the request timeout (seconds).
+                    - type: I{float}
+                    - default: 90
+            - B{poolsize} - The max number of idle connections kept per host.
+                    - type: I{int}
+                    - default: 4
+            - B{keepalive} - The number of seconds an idle connection is kept.
+                    - type: I{float}
+                    - default: 60
+        Host addresses are resolved on the submitting thread (and cached
+        for I{keepalive} seconds) so a slow lookup does not stall the
+        I/O thread.
+        """
+        from suds.properties import Unskin
+        Transport.__init__(self)
+        Unskin(self.options).update(kwargs)
+        self.lock = Lock()
+        self.queue = []
+        self.idle = {}
+        self.channels = []
+        self.thread = None
+        self.wakeup = os.pipe()
+        self.addresses = {}
+        self.closed = False
+
+    def submit(self, request, callback):
+        """
+        Submit a request.
+        @param request: A transport request.
+        @type request: L{Request}
+        @param callback: Called on the I/O thread as callback(reply, exception)
+            where I{reply} is a L{Reply} (any http status) or I{None}.
+        @type callback: callable
+        @raise TransportError: When the transport has been closed.
+        """
+        exchange = Exchange(request, callback, self.options.timeout)
+        try:
+            exchange.address = self.resolve(exchange.host, exchange.port)
+        except Exception, e:
+            exchange.error = e
+        self.lock.acquire()
+        try:
+            if self.closed:
+                raise TransportError('transport closed', 0)
+            self.queue.append(exchange)
+            if self.thread is None:
+                self.thread = Thread(target=self.run, name='suds-io')
+                self.thread.setDaemon(True)
+                self.thread.start()
+            os.write(self.wakeup[1], 'x')
+        finally:
+            self.lock.release()
+
+    def resolve(self, host, port):
+        """
+        Resolve a host address (blocking) using a short lived cache.
+        @param host: The host name.
+        @type host: str
+        @param port: The port.
+        @type port: int
+        @return: The address as returned by getaddrinfo().
+        @rtype: tuple
+        """
+        key = (host, port)
+        now = time.time()
+        cached = self.addresses.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        address = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0]
+        self.addresses[key] = (now + self.options.keepalive, address)
+        return address
+
+    def close(self):
+        """
+        Close the transport.  Requests still in flight fail with a
+        L{TransportError}, connections are closed and the I/O
+        thread exits.  Does nothing when already closed.
+        """
+        self.lock.acquire()
+        try:
+            if self.closed:
+                return
+            self.closed = True
+            thread = self.thread
+            if thread is None:
+                self.shutdown([])
+            else:
+                os.write(self.wakeup[1], 'x')
+        finally:
+            self.lock.release()
+        if thread is not None and thread is not currentThread():
+            thread.join()
+
+    def send(self, request):
+        """
+        Blocking send implemented on top of L{submit}.
+        """
+        from threading import Event
+        done = Event()
+        result = []
+        def callback(reply, exception):
+            result.append((reply, exception))
+            done.set()
+        self.submit(request, callback)
+        done.wait()
+        reply, exception = result[0]
+        if exception is not None:
+            raise exception
+        if reply.code in (202, 204):
+            return None
+        if reply.code >= 300:
+            reason = 'HTTP Error %d' % reply.code
+            raise TransportError(reason, reply.code, StringIO(reply.message))
+        return reply
+
+    def run(self):
+        while self.wakeup is not None:
+            try:
+                self.loop()
+            except Exception:
+                log.exception('io loop failed')
+
+    def loop(self):
+        self.lock.acquire()
+        try:
+            queued = self.queue
+            self.queue = []
+            closed = self.closed
+        finally:
+            self.lock.release()
+        if closed:
+            self.shutdown(queued)
+            return
+        for exchange in queued:
+            self.start(exchange)
+        rd = [self.wakeup[0]]
+        wr = []
+        for c in self.channels:
+            if c.wantread:
+                rd.append(c)
+            if c.wantwrite:
+                wr.append(c)
+        timeout = 1.0
+        now = time.time()
+        for c in self.channels:
+            timeout = max(0, min(timeout, c.exchange.deadline - now))
+        rd, wr, x = select.select(rd, wr, [], timeout)
+        if self.wakeup[0] in rd:
+            os.read(self.wakeup[0], 4096)
+            rd.remove(self.wakeup[0])
+        for c in wr:
+            self.io(c, c.writable)
+        for c in rd:
+            if c in self.channels:
+                self.io(c, c.readable)
+        now = time.time()
+        for c in self.channels[:]:
+            if c.exchange.deadline < now:
+                self.failed(c, TransportError('timed out', 0))
+
+    def shutdown(self, queued):
+        """
+        Fail the queued and in-flight exchanges, close all connections
+        and the wakeup pipe.
+        @param queued: Exchanges not yet started.
+        @type queued: list
+        """
+        error = TransportError('transport closed', 0)
+        for c in self.channels:
+            c.close()
+            queued.append(c.exchange)
+        self.channels = []
+        for idle in self.idle.values():
+            for c in idle:
+                c.close()
+        self.idle = {}
+        for fd in self.wakeup:
+            os.close(fd)
+        self.wakeup = None
+        for exchange in queued:
+            self.complete(exchange, None, error)
+
+    def start(self, exchange):
+        """
+        Start an exchange on an idle channel or a new one.  Idle
+        channels which have expired or been closed by the server
+        are discarded.
+        @param exchange: An exchange.
+        @type exchange: L{Exchange}
+        """
+        if exchange.error is not None:
+            self.complete(exchange, None, exchange.error)
+            return
+        channel = None
+        idle = self.idle.get(exchange.key, [])
+        now = time.time()
+        while len(idle):
+            c = idle.pop()
+            if now - c.released > self.options.keepalive or c.dropped():
+                c.close()
+                continue
+            channel = c
+            break
+        if channel is None:
+            exchange.retry = False
+            try:
+                channel = Channel(exchange.key, exchange.address)
+            except Exception, e:
+                self.complete(exchange, None, e)
+                return
+        channel.start(exchange)
+        self.channels.append(channel)
+
+    def io(self, channel, fn):
+        try:
+            if fn():
+                self.succeeded(channel)
+        except Exception, e:
+            self.failed(channel, e)
+
+    def succeeded(self, channel):
+        exchange = channel.exchange
+        self.channels.remove(channel)
+        channel.exchange = None
+        if exchange.keepalive():
+            channel.reused = True
+            channel.released = time.time()
+            channel.wantread = channel.wantwrite = False
+            idle = self.idle.setdefault(channel.key, [])
+            if len(idle) < self.options.poolsize:
+                idle.append(channel)
+            else:
+                channel.close()
+        else:
+            channel.close()
+        self.complete(exchange, exchange.reply(), None)
+
+    def failed(self, channel, exception):
+        exchange = channel.exchange
+        self.channels.remove(channel)
+        channel.close()
+        if isinstance(exception, Unsent) and channel.reused and exchange.retry:
+            # the server dropped the idle connection before reading the request
+            log.debug('reused connection failed: %s, retrying', exception)
+            exchange.reset()
+            exchange.retry = False
+            self.start(exchange)
+            return
+        self.complete(exchange, None, exception)
+
+    def complete(self, exchange, reply, exception):
+        try:
+            exchange.callback(reply, exception)
+        except Exception:
+            log.exception('callback failed')
@@ -44,6 +44,14 @@ class Options(Skin):
         - B{password} - The password used for http authentication.
                 - type: I{str}
                 - default: None
+        - B{poolsize} - The max number of idle (keep-alive) connections
+            kept per host by pooled transports.
+                - type: I{int}
+                - default: 4
+        - B{keepalive} - The number of seconds an idle (keep-alive)
+            connection is kept by pooled transports.
+                - type: I{float}
+                - default: 60
     """    
     def __init__(self, **kwargs):
         domain = __name__
@@ -53,5 +61,7 @@ class Options(Skin):
             Definition('headers', dict, {}),
             Definition('username', basestring, None),
             Definition('password', basestring, None),
+            Definition('poolsize', int, 4),
+            Definition('keepalive', (int,float), 60),
         ]
         Skin.__init__(self, domain, definitions, kwargs)
\ No newline at end of file
@@ -0,0 +1,420 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the (LGPL) GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Library Lesser General Public License for more details at
+# ( http://www.gnu.org/licenses/lgpl.html ).
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+Contains classes for pooled (HTTP/1.1 keep-alive) transport implementations.
+"""
+
+import urllib2 as u2
+import errno
+import httplib
+import select
+import socket
+import time
+from threading import Lock
+from cStringIO import StringIO
+from suds.transport import *
+from suds.transport.http import HttpTransport
+from suds.transport.https import HttpAuthenticated
+from logging import getLogger
+
+log = getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of persistent I{httplib} connections.
+    Connections are keyed by (scheme, host, tunnel) so that connections
+    made through a proxy are never handed out for direct requests.
+    @ivar maxsize: The max number of idle connections kept per host.
+    @type maxsize: int
+    @ivar keepalive: The number of seconds an idle connection is kept
+        before it is evicted.
+    @type keepalive: float
+    @ivar idle: The idle connections by key as [(connection, released),..].
+    @type idle: dict
+    """
+
+    def __init__(self, maxsize=4, keepalive=60):
+        """
+        @param maxsize: The max number of idle connections kept per host.
+        @type maxsize: int
+        @param keepalive: The number of seconds an idle connection is kept.
+        @type keepalive: float
+        """
+        self.maxsize = maxsize
+        self.keepalive = keepalive
+        self.idle = {}
+        self.lock = Lock()
+
+    def checkout(self, key):
+        """
+        Check out an idle connection for the specified I{key}.
+        Connections idle for longer than I{keepalive} are evicted.
+        @param key: A connection key.
+        @type key: tuple
+        @return: A connection or None when none are available.
+        @rtype: I{httplib.HTTPConnection}
+        """
+        conn = None
+        expired = []
+        live = []
+        now = time.time()
+        self.lock.acquire()
+        try:
+            for c, released in self.idle.get(key, ()):
+                if now - released > self.keepalive:
+                    expired.append(c)
+                else:
+                    live.append((c, released))
+            if len(live):
+                conn = live.pop()[0]
+            self.idle[key] = live
+        finally:
+            self.lock.release()
+        for c in expired:
+            log.debug('evicted idle connection (%s)', c.host)
+            c.close()
+        return conn
+
+    def checkin(self, key, conn):
+        """
+        Return a connection to the pool.  The connection is closed
+        when the pool for I{key} is already full.
+        @param key: A connection key.
+        @type key: tuple
+        @param conn: A connection.
+        @type conn: I{httplib.HTTPConnection}
+        """
+        self.lock.acquire()
+        try:
+            idle = self.idle.setdefault(key, [])
+            if len(idle) < self.maxsize:
+                idle.append((conn, time.time()))
+                return
+        finally:
+            self.lock.release()
+        conn.close()
+
+    def clear(self):
+        """
+        Close all idle connections.
+        """
+        self.lock.acquire()
+        try:
+            idle = self.idle
+            self.idle = {}
+        finally:
+            self.lock.release()
+        for conns in idle.values():
+            for c, released in conns:
+                c.close()
+
+
+class Unsent(Exception):
+    """
+    A request failed on a reused connection in a way that shows the
+    server did not receive it (the server had closed the connection),
+    so it is safe to send again, even when it is not idempotent.
+    """
+    pass
+
+
+class PooledResponse:
+    """
+    A reply read directly from a pooled connection, as it is received.
+    When the reply has been read to the end (or I{close()}d after that),
+    the connection is returned to the pool.  A reply closed before the
+    end closes the connection, which can't be reused.
+    @ivar pool: The connection pool.
+    @type pool: L{ConnectionPool}
+    @ivar key: The pool key.
+    @type key: tuple
+    @ivar conn: The connection, or None once released.
+    @type conn: I{httplib.HTTPConnection}
+    @ivar response: The reply.
+    @type response: I{httplib.HTTPResponse}
+    """
+
+    def __init__(self, pool, key, conn, response):
+        """
+        @param pool: The connection pool.
+        @type pool: L{ConnectionPool}
+        @param key: The pool key.
+        @type key: tuple
+        @param conn: The connection.
+        @type conn: I{httplib.HTTPConnection}
+        @param response: The reply.
+        @type response: I{httplib.HTTPResponse}
+        """
+        self.pool = pool
+        self.key = key
+        self.conn = conn
+        self.response = response
+
+    def read(self, size=-1):
+        if self.conn is None:
+            return ''
+        if size is None or size < 0:
+            data = self.response.read()
+        else:
+            data = self.response.read(size)
+        if self.response.isclosed():
+            self.release()
+        return data
+
+    def readline(self, size=-1):
+        # only used by urllib2 for error replies, which are not streamed
+        return self.read(size)
+
+    def close(self):
+        self.release()
+
+    def release(self):
+        """
+        Return the connection to the pool when the reply was read to the
+        end, else close it.
+        """
+        conn = self.conn
+        if conn is None:
+            return
+        self.conn = None
+        if self.response.isclosed() and not self.response.will_close:
+            self.pool.checkin(self.key, conn)
+        else:
+            conn.close()
+
+
+class KeepAliveMixin:
+    """
+    Provides an urllib2 I{do_open()} that reuses connections from
+    a L{ConnectionPool} rather than opening a new connection (and
+    closing it) for each request.  A request on a reused connection
+    is only sent again on a new connection when it fails in a way
+    that shows the server did not receive it (see L{exchange}): a
+    timeout or an error after the reply was started is raised, as
+    the server may have run the request.
+    A request marked with a true I{stream} attribute gets a
+    L{PooledResponse} for a I{200} reply instead of a buffered one.
+    @ivar pool: The connection pool.
+    @type pool: L{ConnectionPool}
+    """
+
+    # errors raised when writing to a socket the server has closed
+    closed = (errno.EPIPE, errno.ECONNRESET, errno.ECONNABORTED)
+
+    def do_open(self, http_class, req, **http_conn_args):
+        host = req.get_host()
+        if not host:
+            raise u2.URLError('no host given')
+        headers = dict(req.unredirected_hdrs)
+        headers.update(dict((k, v) for k, v in req.headers.items()
+                            if k not in headers))
+        headers['Connection'] = 'keep-alive'
+        headers = dict((n.title(), v) for n, v in headers.items())
+        tunnel = getattr(req, '_tunnel_host', None)
+        tunnel_headers = {}
+        if tunnel and 'Proxy-Authorization' in headers:
+            tunnel_headers['Proxy-Authorization'] = \
+                headers.pop('Proxy-Authorization')
+        key = (req.get_type(), host, tunnel)
+        conn = self.pool.checkout(key)
+        if conn is not None:
+            try:
+                return self.exchange(key, conn, req, headers, True)
+            except Unsent, e:
+                log.debug('reused connection closed by the server (%s), retrying', e)
+                if hasattr(req.data, 'seek'):
+                    req.data.seek(0)
+            except (socket.error, httplib.HTTPException), e:
+                raise u2.URLError(e)
+        conn = http_class(host, timeout=req.timeout, **http_conn_args)
+        conn.set_debuglevel(self._debuglevel)
+        if tunnel:
+            conn.set_tunnel(tunnel, headers=tunnel_headers)
+        try:
+            return self.exchange(key, conn, req, headers, False)
+        except Unsent, e:
+            raise u2.URLError(e.args[0])
+        except (socket.error, httplib.HTTPException), e:
+            raise u2.URLError(e)
+
+    def exchange(self, key, conn, req, headers, reused):
+        """
+        Send the request and get the reply on I{conn}.  The reply is read
+        fully so that the connection may be returned to the pool, unless
+        it is streamed (see L{PooledResponse}).  The connection is closed
+        when the exchange fails.
+        @param key: The pool key.
+        @type key: tuple
+        @param conn: An open (or new) connection.
+        @type conn: I{httplib.HTTPConnection}
+        @param req: A urllib2 request.
+        @type req: urllib2.Request
+        @param headers: The http headers.
+        @type headers: dict
+        @param reused: The connection was checked out of the pool.
+        @type reused: bool
+        @return: An I{addinfourl} object.
+        @rtype: I{addinfourl}
+        @raise Unsent: When I{conn} was reused and is found closed by the
+            server before the request is written, the first write fails
+            as the server has closed it, or the server closes it without
+            sending any of the reply.
+        """
+        try:
+            if reused and self.dropped(conn):
+                raise Unsent('closed while idle')
+            self.send(conn, req, headers, reused)
+            try:
+                r = conn.getresponse()
+            except httplib.BadStatusLine, e:
+                if reused and self.empty(e):
+                    raise Unsent('closed without a reply')
+                raise
+            if getattr(req, 'stream', False) and r.status == 200:
+                fp = PooledResponse(self.pool, key, conn, r)
+            else:
+                fp = StringIO(r.read())
+                if r.will_close:
+                    conn.close()
+                else:
+                    self.pool.checkin(key, conn)
+        except:
+            conn.close()
+            raise
+        resp = u2.addinfourl(fp, r.msg, req.get_full_url())
+        resp.code = r.status
+        resp.msg = r.reason
+        return resp
+
+    def send(self, conn, req, headers, reused):
+        """
+        Write the request on I{conn}.
+        @raise Unsent: When I{conn} was reused and the first write fails
+            because the server has closed the connection.
+        """
+        written = [False]
+        write = conn.send
+        def send(data):
+            try:
+                write(data)
+            except socket.timeout:
+                raise
+            except socket.error, e:
+                if reused and not written[0] and e.args[0] in self.closed:
+                    raise Unsent(e)
+                raise
+            written[0] = True
+        conn.send = send
+        try:
+            conn.request(req.get_method(), req.get_selector(), req.data, headers)
+        finally:
+            del conn.send
+
+    def empty(self, e):
+        """
+        Get whether a I{BadStatusLine} was raised because the connection
+        was closed before any of the reply was received.
+        @param e: The exception.
+        @type e: I{httplib.BadStatusLine}
+        @rtype: bool
+        """
+        # older pythons give the (empty) line, newer ones explain it
+        line = getattr(e, 'line', None) or ''
+        return line in ('', repr('')) or line.startswith('No status line received')
+
+    def dropped(self, conn):
+        """
+        Get whether an idle connection has been closed by the server.
+        An idle connection is readable only when the server has closed
+        it (or sent something unexpected), either way it can't be used.
+        @param conn: An idle connection.
+        @type conn: I{httplib.HTTPConnection}
+        @rtype: bool
+        """
+        if conn.sock is None:
+            return False
+        try:
+            return len(select.select([conn.sock], [], [], 0)[0]) > 0
+        except (select.error, socket.error, ValueError):
+            return True
+
+
+class KeepAliveHTTPHandler(KeepAliveMixin, u2.HTTPHandler):
+    """
+    The urllib2 I{http} handler backed by a connection pool.
+    """
+
+    def __init__(self, pool, debuglevel=0):
+        u2.HTTPHandler.__init__(self, debuglevel)
+        self.pool = pool
+
+
+class KeepAliveHTTPSHandler(KeepAliveMixin, u2.HTTPSHandler):
+    """
+    The urllib2 I{https} handler backed by a connection pool.
+    """
+
+    def __init__(self, pool, debuglevel=0):
+        u2.HTTPSHandler.__init__(self, debuglevel)
+        self.pool = pool
+
+
+class HttpPooled(HttpAuthenticated):
+    """
+    HTTP transport that keeps connections alive (HTTP/1.1) and reuses
+    them across requests.  The connection pool is bounded per host,
+    evicts idle connections and is safe to share between threads.
+    Cookies and proxies are handled as in L{HttpTransport}.
+    @ivar pool: The connection pool.
+    @type pool: L{ConnectionPool}
+    """
+
+    def __init__(self, **kwargs):
+        """
+        @param kwargs: Keyword arguments.
+            - B{proxy} - An http proxy to be specified on requests.
+                 The proxy is defined as {protocol:proxy,}
+                    - type: I{dict}
+                    - default: {}
+            - B{timeout} - Set the url open timeout (seconds).
+                    - type: I{float}
+                    - default: 90
+            - B{poolsize} - The max number of idle connections kept per host.
+                    - type: I{int}
+                    - default: 4
+            - B{keepalive} - The number of seconds an idle connection is kept.
+                    - type: I{float}
+                    - default: 60
+        """
+        HttpAuthenticated.__init__(self, **kwargs)
+        self.pool = ConnectionPool(self.options.poolsize, self.options.keepalive)
+
+    def u2open(self, u2request):
+        self.pool.maxsize = self.options.poolsize
+        self.pool.keepalive = self.options.keepalive
+        return HttpAuthenticated.u2open(self, u2request)
+
+    def u2handlers(self):
+        handlers = HttpAuthenticated.u2handlers(self)
+        handlers.append(KeepAliveHTTPHandler(self.pool))
+        handlers.append(KeepAliveHTTPSHandler(self.pool))
+        return handlers
+
+    def __deepcopy__(self, memo={}):
+        clone = HttpAuthenticated.__deepcopy__(self, memo)
+        clone.pool = self.pool
+        return clone
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+"""
+Downloads the docmail WSDLs into docmail/wsdl, the copies the client uses
+instead of downloading the WSDL when it starts, eg:
+
+    python update_wsdl.py            # all of live, test and beta
+    python update_wsdl.py test
+
+the copies aren't kept in the repository: run this as a build/deploy step, and
+again when docmail publish a new version of the API. clients only use a copy
+when created with bundled_wsdl=True, and download the WSDL (with a warning) if
+this hasn't been run. clients created with check_bundled_wsdl=True as well
+compare their bundled copy with the remote one and use the remote WSDL if they
+differ
+"""
+
+import sys
+
+from docmail import client
+
+WSDL_URLS = { 'live': client.DOCMAIL_WSDL_LIVE,
+              'test': client.DOCMAIL_WSDL_TEST,
+              'beta': client.DOCMAIL_WSDL_BETA }
+
+def main(argv):
+    names = argv[1:] or sorted(WSDL_URLS.keys())
+    for name in names:
+        if name not in WSDL_URLS:
+            print 'usage: %s [live|test|beta ...]' % argv[0]
+            return 2
+    for name in names:
+        version = client.update_bundled_wsdl(WSDL_URLS[name])
+        print '%s: %s (%s)' % (name, version['sha1'], version['fetched'])
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))